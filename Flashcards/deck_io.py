@@ -0,0 +1,139 @@
+import os
+import re
+import sqlite3
+from urllib.request import pathname2url
+
+# The text format has one card per line: "term; definition; error count". A backslash or a semicolon in a field is
+# escaped with a backslash, so a field can contain "; ". Fields without them are written as they are, so the files of
+# older versions can still be read and files without such fields can still be read by older versions.
+SEPARATOR = "; "
+# Decks in files with these extensions are SQLite databases
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+# The number of bytes the text files are buffered with
+BUFFER_SIZE = 1 << 20
+# The tokens of a line with escapes: an escaped backslash or semicolon, a separator, a run of plain characters or a
+# backslash or semicolon on its own
+TOKEN = re.compile(r"\\([\\;])|(; )|([^\\;]+|[\\;])")
+# Control characters that stand in for the escaped pairs while a line is split, see parse_line()
+ESCAPED_BACKSLASH = "\x00"
+ESCAPED_SEMICOLON = "\x01"
+
+
+def escape_field(field: str) -> str:
+    """Return a field for the text format, with its backslashes and semicolons escaped."""
+    if "\\" in field or ";" in field:
+        return field.replace("\\", "\\\\").replace(";", "\\;")
+    return field
+
+
+def parse_line(line: str) -> list:
+    """Return the unescaped fields of a line of the text format. The line is split at every "; " that isn't escaped.
+    A backslash that doesn't escape a backslash or a semicolon is kept."""
+    line = line.rstrip("\n")
+    if "\\" not in line:
+        return line.split(SEPARATOR)
+    if ESCAPED_BACKSLASH not in line and ESCAPED_SEMICOLON not in line:
+        # Hide the escaped pairs, so only the real separators are left to split at. Replacing from left to right
+        # pairs the backslashes up like the tokens do, but runs in C instead of a loop over the tokens.
+        line = line.replace("\\\\", ESCAPED_BACKSLASH).replace("\\;", ESCAPED_SEMICOLON)
+        return [field.replace(ESCAPED_BACKSLASH, "\\").replace(ESCAPED_SEMICOLON, ";")
+                for field in line.split(SEPARATOR)]
+    fields = []
+    field = []
+    for escaped, separator, plain in TOKEN.findall(line):
+        if separator:
+            fields.append("".join(field))
+            field = []
+        else:
+            field.append(escaped or plain)
+    fields.append("".join(field))
+    return fields
+
+
+def is_sqlite_deck(path: str) -> bool:
+    """Return True if a deck file is an SQLite database, by its extension."""
+    return os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS
+
+
+def read_text_deck(path: str):
+    """Yield the term, the definition and the error count of every card in a text file, one line at a time."""
+    with open(path, "r", buffering=BUFFER_SIZE) as file:
+        for line_number, line in enumerate(file, 1):
+            fields = parse_line(line)
+            if len(fields) != 3:
+                raise ValueError(f"{path}, line {line_number}: expected 3 fields, found {len(fields)}")
+            term, definition, error_count = fields
+            yield term, definition, int(error_count)
+
+
+def write_text_deck(path: str, cards) -> None:
+    """Write cards (an iterable of term, definition and error count) to a text file, in big buffered chunks."""
+    with open(path, "w", buffering=BUFFER_SIZE) as file:
+        file.writelines(f"{escape_field(term)}{SEPARATOR}{escape_field(definition)}{SEPARATOR}{error_count}\n"
+                        for term, definition, error_count in cards)
+
+
+def connect_read_only(path: str) -> sqlite3.Connection:
+    """Return a read-only connection to an SQLite deck, so reading a deck never changes the file."""
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Return a connection to an SQLite deck and create its table and indexes if they don't exist. The terms and the
+    definitions are indexed, so looking a card up by either doesn't read the whole deck."""
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE IF NOT EXISTS cards "
+                       "(term TEXT PRIMARY KEY, definition TEXT NOT NULL, error_count INTEGER NOT NULL DEFAULT 0)")
+    connection.execute("CREATE INDEX IF NOT EXISTS cards_definition ON cards (definition)")
+    return connection
+
+
+def read_sqlite_deck(path: str):
+    """Yield the term, the definition and the error count of every card in an SQLite deck."""
+    connection = connect_read_only(path)
+    try:
+        yield from connection.execute("SELECT term, definition, error_count FROM cards ORDER BY rowid")
+    finally:
+        connection.close()
+
+
+def write_sqlite_deck(path: str, cards) -> None:
+    """Write cards (an iterable of term, definition and error count) to an SQLite deck, replacing its cards, in a
+    single transaction."""
+    connection = connect(path)
+    try:
+        with connection:
+            connection.execute("DELETE FROM cards")
+            connection.executemany("INSERT INTO cards VALUES (?, ?, ?)", cards)
+    finally:
+        connection.close()
+
+
+def find_card(path: str, term: str = None, definition: str = None):
+    """Return the term, the definition and the error count of the card with a term or a definition in an SQLite deck,
+    or None if there is no such card."""
+    connection = connect_read_only(path)
+    try:
+        if term is not None:
+            row = connection.execute("SELECT term, definition, error_count FROM cards WHERE term = ?", (term,))
+        else:
+            row = connection.execute("SELECT term, definition, error_count FROM cards WHERE definition = ?",
+                                     (definition,))
+        return row.fetchone()
+    finally:
+        connection.close()
+
+
+def read_deck(path: str):
+    """Yield the cards of a deck file, see read_text_deck() and read_sqlite_deck()."""
+    if is_sqlite_deck(path):
+        return read_sqlite_deck(path)
+    return read_text_deck(path)
+
+
+def write_deck(path: str, cards) -> None:
+    """Write cards to a deck file, see write_text_deck() and write_sqlite_deck()."""
+    if is_sqlite_deck(path):
+        write_sqlite_deck(path, cards)
+    else:
+        write_text_deck(path, cards)
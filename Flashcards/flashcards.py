@@ -1,18 +1,36 @@
 import os
+import heapq
 import random
 import argparse
+import deck_io
 import flashcard_logger as logger
 
 
 class FlashCard:
     """A class for a simple flashcard with a term and a definition, and a counter for wrong answers."""
+    # No __dict__ per card, so big collections take less memory
+    __slots__ = ("term", "definition", "error_count", "ease", "interval", "repetitions", "due", "number")
+
+    # The SM-2 ease factor of a new card and the lowest ease factor of a card
+    INITIAL_EASE = 2.5
+    MIN_EASE = 1.3
+
     def __init__(self, term, definition, previous_errors=0):
         self.term = term
         self.definition = definition
         self.error_count = int(previous_errors)
+        # The spaced repetition state: the next interval grows by the ease factor after every correct answer in a row,
+        # the card is due again at the review number in due
+        self.ease = self.INITIAL_EASE
+        self.interval = 0
+        self.repetitions = 0
+        self.due = 0
+        # The order in which the card was added to its collection
+        self.number = 0
 
-    def ask_definition(self, collection: dict = None) -> None:
-        """Ask the user for the definition of the card's term and check if the answer is correct.
+    def ask_definition(self, collection: dict = None) -> bool:
+        """Ask the user for the definition of the card's term and check if the answer is correct. Return True if it
+        is.
 
         If a collection is passed, check if the definition belongs to another term in case of a wrong answer.
 
@@ -22,6 +40,7 @@ class FlashCard:
         answer = logger.get_input_and_log(f"Print the definition of \"{self.term}\":")
         if answer == self.definition:
             logger.log_and_print("Correct!")
+            return True
         elif collection:
             if answer in collection.keys():
                 self.error_count += 1
@@ -33,11 +52,35 @@ class FlashCard:
         else:
             self.error_count += 1
             logger.log_and_print(f"Wrong. The right answer is \"{self.definition}\".")
-    
+        return False
+
     def reset_errors(self) -> None:
         """Reset error count."""
         self.error_count = 0
 
+    def review(self, correct: bool, now: int) -> None:
+        """Schedule the next review of the card after an answer at review number now, like SM-2: a wrong answer
+        starts the repetitions over, a correct answer makes the interval 1, 6 and then ease times longer. The ease
+        factor grows after a correct answer and shrinks after a wrong one.
+
+        :param correct: Whether the answer was correct. Counts as grade 5 of SM-2 if so, else as grade 1.
+        :param now: The number of the review (the logical clock of the collection).
+        """
+        grade = 5 if correct else 1
+        if correct:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = 1
+            elif self.repetitions == 2:
+                self.interval = 6
+            else:
+                self.interval = round(self.interval * self.ease)
+        else:
+            self.repetitions = 0
+            self.interval = 1
+        self.ease = max(self.MIN_EASE, self.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+        self.due = now + self.interval
+
 
 class FlashCardCollection:
     """A class for a collection of flashcards.
@@ -47,11 +90,104 @@ class FlashCardCollection:
     - importing and exporting collections of cards
     - asking the user for definitions of a term of a random flashcard from the collection"
     - showing the card with the highest number of errors
-    - resetting all cards error count"""
+    - resetting all cards error count
+    - asking the cards in the order of a spaced repetition schedule instead of at random"""
 
-    def __init__(self):
+    def __init__(self, spaced_repetition: bool = False):
         self.collection = {}
         self.terms_and_defs = {}
+        # All terms in a list, for picking a random card in O(1), and the position of every term in the list
+        self.terms = []
+        self.term_positions = {}
+        # The terms of the cards with errors by their number of errors {error count: {term: None}}, and the highest
+        # error count, so hardest_card() doesn't look at every card
+        self.error_buckets = {}
+        self.max_errors = 0
+        # The number of cards added so far, to number the cards in the order of the collection
+        self.added_count = 0
+        # The schedule: a heap of (due, number, card) and a logical clock that counts the reviews. Removed and
+        # rescheduled cards stay in the heap until they are popped and skipped.
+        self.spaced_repetition = spaced_repetition
+        self.schedule = []
+        self.scheduled_count = 0
+        self.clock = 0
+
+    def store_card(self, card: FlashCard) -> None:
+        """Add a card to the collection, or replace the card with the same term."""
+        if card.term in self.collection:
+            old_card = self.collection[card.term]
+            del self.terms_and_defs[old_card.definition]
+            self.update_error_bucket(card.term, old_card.error_count, 0)
+            # A replaced card keeps its place in the collection
+            card.number = old_card.number
+        else:
+            self.term_positions[card.term] = len(self.terms)
+            self.terms.append(card.term)
+            card.number = self.added_count
+            self.added_count += 1
+        self.collection[card.term] = card
+        self.terms_and_defs[card.definition] = card.term
+        self.update_error_bucket(card.term, 0, card.error_count)
+        if self.spaced_repetition:
+            card.due = self.clock
+            self.push_card(card)
+
+    def delete_card(self, term: str) -> None:
+        """Remove the card with a term from the collection. The last term in the list takes the place of the removed
+        term, so removing a card takes O(1)."""
+        card = self.collection.pop(term)
+        del self.terms_and_defs[card.definition]
+        self.update_error_bucket(term, card.error_count, 0)
+        position = self.term_positions.pop(term)
+        last_term = self.terms.pop()
+        if last_term != term:
+            self.terms[position] = last_term
+            self.term_positions[last_term] = position
+
+    def random_card(self) -> FlashCard:
+        """Return a random card of the collection."""
+        return self.collection[random.choice(self.terms)]
+
+    def update_error_bucket(self, term: str, old_count: int, new_count: int) -> None:
+        """Move a term from the bucket of its old error count to the bucket of its new error count. Cards without
+        errors aren't in a bucket."""
+        if old_count == new_count:
+            return
+        if old_count:
+            bucket = self.error_buckets[old_count]
+            del bucket[term]
+            if not bucket:
+                del self.error_buckets[old_count]
+        if new_count:
+            self.error_buckets.setdefault(new_count, {})[term] = None
+            self.max_errors = max(self.max_errors, new_count)
+        if self.max_errors not in self.error_buckets:
+            # There are only as many buckets as different error counts
+            self.max_errors = max(self.error_buckets, default=0)
+
+    def push_card(self, card: FlashCard) -> None:
+        """Add a card to the schedule at its due time. The heap is rebuilt without its skipped entries when they
+        outnumber the cards."""
+        heapq.heappush(self.schedule, (card.due, self.scheduled_count, card))
+        self.scheduled_count += 1
+        if len(self.schedule) > 2 * len(self.collection) + 16:
+            self.schedule = [entry for entry in self.schedule if self.is_scheduled(entry)]
+            heapq.heapify(self.schedule)
+
+    def is_scheduled(self, entry: tuple) -> bool:
+        """Return True if a heap entry is the current one of a card in the collection."""
+        due, _, card = entry
+        return self.collection.get(card.term) is card and card.due == due
+
+    def next_card(self) -> FlashCard:
+        """Remove the card that is due first from the schedule and return it. If it isn't due yet, the clock is moved
+        forward to its due time."""
+        while True:
+            entry = heapq.heappop(self.schedule)
+            if self.is_scheduled(entry):
+                card = entry[2]
+                self.clock = max(self.clock, card.due)
+                return card
 
     def add_flashcard(self) -> None:
         """Ask the user for a term and a definition and create a new flashcard of it. Flashcards can NOT have the
@@ -68,17 +204,14 @@ class FlashCardCollection:
                 definition = logger.get_input_and_log(f"The definition \"{definition}\" already exists. Try again:")
             else:
                 break
-        self.collection[term] = FlashCard(term, definition)
-        self.terms_and_defs[definition] = term
+        self.store_card(FlashCard(term, definition))
         logger.log_and_print(f"The pair (\"{term}\":\"{definition}\") has been added.")
 
     def remove_flashcard(self) -> None:
         """Remove a flashcard from the collection."""
         card = logger.get_input_and_log("Which card?")
         if card in self.collection.keys():
-            definition = self.collection[card].definition
-            del self.terms_and_defs[definition]
-            del self.collection[card]
+            self.delete_card(card)
             logger.log_and_print("The card has been removed.")
         else:
             logger.log_and_print(f"Can't remove \"{card}\": there is no such card.")
@@ -87,6 +220,7 @@ class FlashCardCollection:
         """
         Import all the cards from a file to the collection. The file name can either be passed in the function or
         through user input. If a card with the same name (term) already exists in the collection, it gets replaced.
+        Files ending with .db, .sqlite or .sqlite3 are read as SQLite decks, other files as text, see deck_io.
 
         :param path: (optional) Name of a file.
         """
@@ -97,22 +231,17 @@ class FlashCardCollection:
         if not os.path.exists(path):
             logger.log_and_print("File not found.")
         else:
-            with open(path, "r") as file:
-                line_count = 0
-                for line in file:
-                    line_count += 1
-                    term, definition, error_count = line.strip("\n").split("; ")
-                    if term in self.collection.keys():
-                        old_def = self.collection[term].definition
-                        del self.terms_and_defs[old_def]
-                    self.collection[term] = FlashCard(term, definition, error_count)
-                    self.terms_and_defs[definition] = term
-            logger.log_and_print(f"{line_count} cards have been loaded.")
+            card_count = 0
+            for term, definition, error_count in deck_io.read_deck(path):
+                self.store_card(FlashCard(term, definition, error_count))
+                card_count += 1
+            logger.log_and_print(f"{card_count} cards have been loaded.")
 
     def export_flashcards(self, path: str = None) -> None:
         """
         Export all the cards in the collection to a file.
-        The file name can either be passed in the function or through user input.
+        The file name can either be passed in the function or through user input. Files ending with .db, .sqlite or
+        .sqlite3 are written as SQLite decks, other files as text, see deck_io.
 
         :param path: (optional) Name of a file.
         """
@@ -120,29 +249,29 @@ class FlashCardCollection:
             path = logger.get_input_and_log("File name:")
         cwd = os.path.dirname(__file__)
         filename = os.path.join(cwd, path)  # doesn't work for the hyperskill tests...
-        with open(path, "w") as file:
-            for card in self.collection:
-                line = f"{card}; {self.collection[card].definition}; {self.collection[card].error_count}\n"
-                file.write(line)
+        deck_io.write_deck(path, ((card.term, card.definition, card.error_count)
+                                  for card in self.collection.values()))
         logger.log_and_print(f"{len(self.terms_and_defs)} cards have been saved.")
 
     def ask_definitions(self) -> None:
         """Ask the user for a definition to a term and checks if it is correct. Repeat n times; n input by user."""
         n = int(logger.get_input_and_log("How many times to ask?"))
         for _ in range(n):
-            card = random.choice(list(self.collection.keys()))
-            self.collection[card].ask_definition(self.terms_and_defs)
+            card = self.next_card() if self.spaced_repetition else self.random_card()
+            error_count = card.error_count
+            correct = card.ask_definition(self.terms_and_defs)
+            self.update_error_bucket(card.term, error_count, card.error_count)
+            if self.spaced_repetition:
+                self.clock += 1
+                card.review(correct, self.clock)
+                self.push_card(card)
 
     def hardest_card(self) -> None:
         """Print the card(s) that got answered wrong the most times their number of errors."""
-        hardest_cards = []
-        max_error_count = 0
-        for card in self.collection:
-            if self.collection[card].error_count > max_error_count:
-                max_error_count = self.collection[card].error_count
-                hardest_cards = [card]
-            elif self.collection[card].error_count == max_error_count and max_error_count > 0:
-                hardest_cards.append(card)
+        max_error_count = self.max_errors
+        # In the order of the collection
+        hardest_cards = sorted(self.error_buckets.get(max_error_count, ()),
+                               key=lambda term: self.collection[term].number)
         if max_error_count == 0:
             logger.log_and_print("There are no cards with errors.")
         elif len(hardest_cards) == 1:
@@ -158,6 +287,8 @@ class FlashCardCollection:
         """Reset the error count of all card in collection to 0."""
         for card in self.collection:
             self.collection[card].reset_errors()
+        self.error_buckets = {}
+        self.max_errors = 0
         logger.log_and_print("Card statistics have been reset.")
 
 
@@ -215,12 +346,15 @@ def parse_arguments() -> argparse.Namespace:
                                                     "automatically at the beginning")
     parser.add_argument("-e", "--export_to", help="name of a file to export the flashcards to automatically "
                                                   "before exiting the program")
+    parser.add_argument("-s", "--spaced_repetition", action="store_true",
+                        help="ask the cards that are due first in a spaced repetition (SM-2) schedule, "
+                             "instead of random cards")
     return parser.parse_args()
 
 
 def main():
-    flashcard_collection = FlashCardCollection()
     args = parse_arguments()
+    flashcard_collection = FlashCardCollection(args.spaced_repetition)
     if args.import_from:
         flashcard_collection.import_flashcards(args.import_from)
     if args.export_to:
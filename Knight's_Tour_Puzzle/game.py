@@ -1,4 +1,11 @@
-import copy
+from tour_solver import KnightMoves, DegreeSolver, TourBuilder, is_possible_start, mirror_tour
+
+# A search of warnsdorff() is given up after this many moves per square of the board, but not before MIN_NODE_LIMIT
+# moves, which gives small boards a little more room to backtrack
+NODE_FACTOR = 10
+MIN_NODE_LIMIT = 10000
+# Tours from a corner of boards with at least this many squares are built by TourBuilder instead of searched
+BUILDER_MIN_SQUARES = 10000
 
 
 class Chessboard:
@@ -19,8 +26,14 @@ class Chessboard:
         self.cell_size = len(str(self.rows * self.cols))
         self.border_length = self.cols * (self.cell_size + 1) + 3
         self.knight_position = start_position  # in coordinates
-        self.board = [[("_" * self.cell_size) for _ in range(self.cols)] for _ in range(self.rows)]
-        self.previous_board = copy.deepcopy(self.board)
+        self.empty_cell = "_" * self.cell_size
+        self.board = [[self.empty_cell] * self.cols for _ in range(self.rows)]
+        # The strings of the cells, padded to the cell size, by their content (see cell())
+        self.cells = {}
+        # The parts of the frame that don't change between moves
+        self.border = " " + "-" * self.border_length
+        self.row_labels = [str(self.rows - row) + "| " for row in range(self.rows)]
+        self.col_numbers = "  " + "".join([" " * self.cell_size + str(col + 1) for col in range(self.cols)])
 
     def __str__(self):
         msg = (f"A Chessboard for the knight's tour puzzle with {self.rows} rows and {self.cols} columns.\n"
@@ -28,21 +41,32 @@ class Chessboard:
                f"To print the current board state, use the classes print_board() method. ")
         return msg
 
-    def print_board(self):
-        """ Print the chess board with borders and numbered columns and rows. """
-        border = " " + "-" * self.border_length
-        col_nums = ""
-        print(border)
-        for row in range(self.rows):
-            row_string = str(self.rows - row) + "| "
-            for col in range(self.cols):
-                row_string += self.board[row][col] + " "
-            row_string += "|"
-            print(row_string)
-        print(border)
-        for col in range(self.cols):
-            col_nums += " " * self.cell_size + str(col + 1)
-        print("  " + "".join([" " * self.cell_size + str(col + 1) for col in range(self.cols)]))
+    def cell(self, content) -> str:
+        """ Return the string of a cell with the given content, right-aligned to the cell size. """
+        cell = self.cells.get(content)
+        if cell is None:
+            cell = self.cells[content] = str(content).rjust(self.cell_size)
+        return cell
+
+    def render(self, overlay: dict = None) -> str:
+        """ Return the chess board with borders and numbered columns and rows as a single string.
+        An overlay {(i, j): cell string, ...} is shown on top of the board, without changing the board. Only the rows
+        with a cell in the overlay are copied, so rendering takes linear time in the number of cells. """
+        rows = self.board
+        if overlay:
+            rows = list(rows)
+            for (i, j), cell in overlay.items():
+                if rows[i] is self.board[i]:
+                    rows[i] = list(rows[i])
+                rows[i][j] = cell
+        lines = [self.border]
+        lines += [label + " ".join(row) + " |" for label, row in zip(self.row_labels, rows)]
+        lines += [self.border, self.col_numbers]
+        return "\n".join(lines)
+
+    def print_board(self, overlay: dict = None):
+        """ Print the chess board with borders and numbered columns and rows, see render(). """
+        print(self.render(overlay))
 
     def coords_to_index(self, coords: list) -> list:
         """ Return indices for a matrix converted from coordinates. coords (x,y) -> board[i][j]
@@ -67,9 +91,9 @@ class Chessboard:
         His old position is set to "*" """
         if self.knight_position:
             old_position = self.coords_to_index(self.knight_position)
-            self.board[old_position[0]][old_position[1]] = " " * (self.cell_size - 1) + "*"
+            self.board[old_position[0]][old_position[1]] = self.cell("*")
         i, j = self.coords_to_index(coords)
-        self.board[i][j] = " " * (self.cell_size - 1) + "X"
+        self.board[i][j] = self.cell("X")
         self.knight_position = coords
 
     def possible_moves(self, coords: list) -> list:
@@ -80,47 +104,37 @@ class Chessboard:
             for y in [-1, 1]:
                 i, j = position[0] + x, position[1] + y
                 if 0 <= i < self.rows and 0 <= j < self.cols:
-                    if self.board[i][j] == ("_" * self.cell_size):
+                    if self.board[i][j] == self.empty_cell:
                         moves.append([i, j])
         for x in [-1, 1]:
             for y in [-2, 2]:
                 i, j = position[0] + x, position[1] + y
                 if 0 <= i < self.rows and 0 <= j < self.cols:
-                    if self.board[i][j] == ("_" * self.cell_size):
+                    if self.board[i][j] == self.empty_cell:
                         moves.append([i, j])
         return [self.index_to_coords(move) for move in moves]
 
     def count_visited_cells(self) -> int:
         """ Return the number of cells that were visited by the knight. """
-        counter = 0
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if self.board[i][j] != "_" * self.cell_size:
-                    counter += 1
-        return counter
-
-    def save_board(self) -> None:
-        """ Save a copy of the current board. """
-        self.previous_board = copy.deepcopy(self.board)
-
-    def restore_board(self) -> None:
-        """ Restore the previous board."""
-        self.board = copy.deepcopy(self.previous_board)
-
-    def mark_landing_positions(self, moves: list) -> None:
-        """ Mark the landing positions on the board with the number of possible next moves from that new position. """
-        self.save_board()
-        for move in moves:
-            number_of_next_moves = len(self.possible_moves(move))
-            self.board[self.rows - move[1]][move[0] - 1] = " " * (self.cell_size - 1) + str(number_of_next_moves)
+        return self.rows * self.cols - sum(row.count(self.empty_cell) for row in self.board)
+
+    def fill_tour(self, tour: list, first_move: int = 1) -> None:
+        """ Number the cells in the order of a tour and move the knight to the tour's last cell.
+        The tour is a list of square numbers, as used in tour_solver.py: square = i * cols + j for board[i][j]. """
+        for move_number, square in enumerate(tour, start=first_move):
+            i, j = divmod(square, self.cols)
+            self.board[i][j] = self.cell(move_number)
+        self.knight_position = self.index_to_coords(divmod(tour[-1], self.cols))
+
+    def landing_positions(self, moves: list) -> dict:
+        """ Return an overlay for render() that marks the landing positions with the number of possible next moves
+        from that new position. """
+        return {tuple(self.coords_to_index(move)): self.cell(len(self.possible_moves(move))) for move in moves}
 
     def make_move(self, coords: list) -> None:
-        """ Make the move to the given coordinate and print the board. """
+        """ Make the move to the given coordinate and print the board with the landing positions marked. """
         self.set_knight_position(coords)
-        self.save_board()
-        self.mark_landing_positions(self.possible_moves(self.knight_position))
-        self.print_board()
-        self.restore_board()
+        self.print_board(self.landing_positions(self.possible_moves(self.knight_position)))
 
 
 def input_board_dimensions_loop() -> list:
@@ -198,54 +212,51 @@ def show_solution(board: Chessboard) -> None:
 
 
 def warnsdorff(board: Chessboard, call: int) -> tuple[Chessboard, bool]:
-    """ Return the solved board based on Warnsdorff's rule. If the board is not solvable, return the board solved
-     up to a dead end. """
-    solved = False
-    # Number of the current move
-    current_move = call
-    # Indices of the knight's current position
-    i, j = board.coords_to_index(board.knight_position)
-    # List of all the possible moves from the knight's current position
-    possible_moves = board.possible_moves(board.knight_position)
-
-    # If there are no more moves, return the board and a bool signaling if the puzzle was solved or not
-    if not possible_moves:
-        board.board[i][j] = " " * (board.cell_size - len(str(current_move))) + str(current_move)
-        # Board solved
-        if board.count_visited_cells() == board.rows * board.cols:
+    """ Return the solved board based on Warnsdorff's rule and a bool signaling if the puzzle was solved or not.
+    The cells are numbered in the order of the moves, starting with the number call at the knight's position.
+    If the board is not solvable, its cells are not changed. Instead of False, None is returned if every search was
+    given up, so there may still be a solution.
+
+    The search is iterative and keeps the degree of every square up to date, see DegreeSolver in tour_solver.py.
+    A search is given up after NODE_FACTOR moves per square (at least MIN_NODE_LIMIT) and the next tie break is
+    tried, since a tie break that runs into dead ends on a board often makes the backtracking explode.
+    Tours from a corner of a large board are built without a search, see corner_tour().
+    Boards and starting positions without a tour by theory are rejected before searching, see is_possible_start(). """
+    if not is_possible_start(board.cols, board.rows, board.knight_position):
+        return board, False
+
+    if board.cols * board.rows >= BUILDER_MIN_SQUARES:
+        tour = corner_tour(board.cols, board.rows, board.knight_position)
+        if tour is not None:
+            board.fill_tour(tour, call)
             return board, True
-        # Dead end
-        else:
-            board.board[i][j] = "_" * board.cell_size
-            return board, False
 
-    while not solved and possible_moves:
-        # Find the next move based on Warnsdorff's rule. (next move is the move with the least possible next moves)
-        next_move = []
-        minimum = None
-        for move in possible_moves:
-            if minimum:
-                if minimum > len(board.possible_moves(move)):
-                    minimum = len(board.possible_moves(move))
-                    next_move = move
-            else:
-                minimum = len(board.possible_moves(move))
-                next_move = move
-
-        # Set the current cell to the number of the current move and move the knight to that position
-        board.board[i][j] = " " * (board.cell_size - len(str(current_move))) + str(current_move)
-        board.knight_position = next_move
-
-        # Recursive call for the next move
-        board, solved = warnsdorff(board, current_move + 1)
+    moves = KnightMoves(board.cols, board.rows)
+    start = moves.square(board.knight_position)
+    node_limit = max(NODE_FACTOR * moves.size, MIN_NODE_LIMIT)
+    for tie_break in DegreeSolver.TIE_BREAKS:
+        solver = DegreeSolver(moves, tie_break)
+        tour = solver.solve(start, node_limit)
+        if tour is not None:
+            board.fill_tour(tour, call)
+            return board, True
+        if solver.nodes < node_limit:
+            # The search wasn't given up, so it tried every path
+            return board, False
+    return board, None
 
-        # If a dead end was reached, reset the board to what it was before the move
-        if not solved:
-            possible_moves.pop(possible_moves.index(next_move))
-            board.board[i][j] = "_" * board.cell_size
-            board.knight_position = board.index_to_coords([i, j])
 
-    return board, solved
+def corner_tour(cols: int, rows: int, coords: list):
+    """ Return a tour from the given coordinates built by TourBuilder, or None if the coordinates aren't a corner of
+    the board or no tour was built. TourBuilder starts in the top left corner, so its tour is mirrored to the corner
+    of the coordinates. """
+    x, y = coords
+    if x not in (1, cols) or y not in (1, rows):
+        return None
+    tour = TourBuilder().build(cols, rows)
+    if tour is None:
+        return None
+    return mirror_tour(cols, rows, tour, flip_rows=y == 1 and rows > 1, flip_cols=x == cols and cols > 1)
 
 
 def main():
@@ -257,8 +268,8 @@ def main():
     # Ask the user if he wants to play or just see the solution
     mode = select_mode_loop()
 
-    # Try to solve the board on a copy of the set-up board
-    solved_board, solved = warnsdorff(copy.deepcopy(board), 1)
+    # Try to solve the puzzle on a second board, the first one is still needed if the user wants to play
+    solved_board, solved = warnsdorff(Chessboard(dimensions, start_position), 1)
 
     # Check if the puzzle has a solution
     if solved:
@@ -268,6 +279,8 @@ def main():
             player_loop(board)
         elif mode == "n":
             show_solution(solved_board)
+    elif solved is None:
+        print("No solution found!")
     else:
         print("No solution exists!")
 
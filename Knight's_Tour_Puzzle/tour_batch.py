@@ -0,0 +1,154 @@
+import argparse
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from tour_solver import KnightMoves, DegreeSolver, is_possible_start
+
+# The file format of the tours:
+#   header: magic, version, cols, rows, item size of a square, number of records
+#   record: start square, status, followed by rows * cols squares if the status is SOLVED
+# All numbers are little-endian, the squares are numbered like in KnightMoves.
+MAGIC = b"KTRS"
+VERSION = 1
+HEADER = struct.Struct("<4sBIIBI")
+RECORD = struct.Struct("<IB")
+
+# The status of a record
+NO_TOUR = 0  # there is no tour from the start square
+SOLVED = 1  # the record is followed by the tour
+GAVE_UP = 2  # the search was given up after its node limit
+
+# The solver and the node limit of a worker process, set up once by init_worker()
+_solver = None
+_node_limit = None
+
+
+def init_worker(solver: DegreeSolver, node_limit: int) -> None:
+    """ Set up a worker process once, instead of for every start square. The solver with its move tables and tie
+    break keys is created by the parent process, so the tables are computed once and shared by all workers
+    (inherited when the workers are forked, pickled once per worker otherwise). """
+    global _solver, _node_limit
+    _solver = solver
+    _node_limit = node_limit
+
+
+def solve_start(start: int) -> tuple:
+    """ Return the status and the tour (or None) from a start square, with the solver of the worker process. """
+    moves = _solver.moves
+    if not is_possible_start(moves.cols, moves.rows, moves.coords(start)):
+        return NO_TOUR, None
+    tour = _solver.solve(start, _node_limit)
+    if tour is not None:
+        return SOLVED, tour
+    if _solver.nodes >= _node_limit:
+        return GAVE_UP, None
+    return NO_TOUR, None
+
+
+def solve_starts(moves: KnightMoves, starts: list, jobs: int = None, tie_break: str = "roth",
+                 node_factor: int = 10):
+    """ Yield the start square, the status and the tour (or None) for every start square, in the order of starts.
+    The start squares are solved in a pool of processes.
+
+    :param moves: The KnightMoves of the board.
+    :param starts: A list of the start squares.
+    :param jobs: (optional) The number of processes. Defaults to the number of CPUs.
+    :param tie_break: (optional) The tie break of the DegreeSolver. Defaults to "roth".
+    :param node_factor: (optional) A search is given up after node_factor times the number of squares nodes.
+        Defaults to 10.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(starts) // (jobs * 4))
+    solver = DegreeSolver(moves, tie_break)
+    with ProcessPoolExecutor(jobs, initializer=init_worker,
+                             initargs=(solver, node_factor * moves.size)) as executor:
+        for start, (status, tour) in zip(starts, executor.map(solve_start, starts, chunksize=chunksize)):
+            yield start, status, tour
+
+
+def square_typecode(size: int) -> str:
+    """ Return the array typecode for the squares of a board with size squares. """
+    return "H" if size <= 1 << 16 else "I"
+
+
+def write_tours(path: str, moves: KnightMoves, results) -> dict:
+    """ Write the results of solve_starts() to a file, while they are computed. Return the number of records of
+    every status. """
+    typecode = square_typecode(moves.size)
+    counts = {NO_TOUR: 0, SOLVED: 0, GAVE_UP: 0}
+    with open(path, "wb") as file:
+        # The number of records is written last, when it is known
+        file.write(HEADER.pack(MAGIC, VERSION, moves.cols, moves.rows, array(typecode).itemsize, 0))
+        for start, status, tour in results:
+            file.write(RECORD.pack(start, status))
+            if status == SOLVED:
+                squares = array(typecode, tour)
+                if sys.byteorder == "big":
+                    squares.byteswap()
+                squares.tofile(file)
+            counts[status] += 1
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, moves.cols, moves.rows, array(typecode).itemsize, sum(counts.values())))
+    return counts
+
+
+def read_tours(path: str) -> tuple:
+    """ Return the columns, the rows and a dictionary {start square: (status, tour or None)} of a file written by
+    write_tours(). Raise a ValueError if the file isn't a tour file. """
+    with open(path, "rb") as file:
+        magic, version, cols, rows, item_size, count = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a tour file")
+        typecode = square_typecode(cols * rows)
+        if array(typecode).itemsize != item_size:
+            raise ValueError(f"{path} has squares of {item_size} bytes, expected {array(typecode).itemsize}")
+        results = {}
+        for _ in range(count):
+            start, status = RECORD.unpack(file.read(RECORD.size))
+            tour = None
+            if status == SOLVED:
+                tour = array(typecode)
+                tour.fromfile(file, cols * rows)
+                if sys.byteorder == "big":
+                    tour.byteswap()
+            results[start] = status, tour
+    return cols, rows, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve the knight's tour from every (or some) start squares of a "
+                                                 "board in parallel and write the tours to a binary file.")
+    parser.add_argument("cols", type=int, help="the number of columns of the board")
+    parser.add_argument("rows", type=int, help="the number of rows of the board")
+    parser.add_argument("-s", "--start", nargs=2, type=int, action="append", metavar=("X", "Y"),
+                        help="the coordinates of a start square, can be repeated (default: all squares)")
+    parser.add_argument("-o", "--output", help="the file to write the tours to (default: tours_<cols>x<rows>.bin)")
+    parser.add_argument("-j", "--jobs", type=int, help="the number of processes (default: number of CPUs)")
+    parser.add_argument("-t", "--tie_break", choices=DegreeSolver.TIE_BREAKS, default="roth",
+                        help="the tie break of the solver (default: roth)")
+    parser.add_argument("--node_factor", type=int, default=10,
+                        help="give up a search after this many times the number of squares nodes (default: 10)")
+    args = parser.parse_args()
+    if args.cols < 1 or args.rows < 1:
+        parser.error("Invalid dimensions!")
+    for x, y in args.start or []:
+        if not (1 <= x <= args.cols and 1 <= y <= args.rows):
+            parser.error(f"Invalid position: {x} {y}")
+
+    moves = KnightMoves(args.cols, args.rows)
+    starts = [moves.square(coords) for coords in args.start] if args.start else list(range(moves.size))
+    output = args.output or f"tours_{args.cols}x{args.rows}.bin"
+
+    start_time = time.perf_counter()
+    counts = write_tours(output, moves, solve_starts(moves, starts, args.jobs, args.tie_break, args.node_factor))
+    seconds = time.perf_counter() - start_time
+    print(f"{len(starts)} start squares in {seconds:.3f} seconds: {counts[SOLVED]} solved, {counts[NO_TOUR]} without "
+          f"a tour, {counts[GAVE_UP]} given up. The tours were written to {output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+import argparse
+import time
+from functools import cached_property
+
+
+class KnightMoves:
+    """ The knight moves of a board, precomputed once for every square.
+    The squares are numbered row by row, in the same order as the indices of Chessboard.board:
+    square = i * cols + j, so the top left square is 0 and the bottom right square is rows * cols - 1. """
+
+    # Same order as in Chessboard.possible_moves()
+    OFFSETS = ((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2))
+
+    def __init__(self, cols: int, rows: int):
+        self.cols, self.rows = cols, rows
+        self.size = cols * rows
+        # The squares a knight can jump to from every square
+        self.neighbours = []
+        for square in range(self.size):
+            i, j = divmod(square, cols)
+            self.neighbours.append(tuple((i + x) * cols + j + y for x, y in self.OFFSETS
+                                         if 0 <= i + x < rows and 0 <= j + y < cols))
+
+    @cached_property
+    def masks(self) -> list:
+        """ The neighbours of every square as a bitmask, where bit n is set if square n can be reached.
+        Every mask is as long as the board, so they are only computed if they are used (by BitboardSolver). """
+        masks = []
+        for neighbours in self.neighbours:
+            mask = 0
+            for neighbour in neighbours:
+                mask |= 1 << neighbour
+            masks.append(mask)
+        return masks
+
+    def square(self, coords: list) -> int:
+        """ Return the number of the square at the given coordinates (x, y). """
+        return (self.rows - coords[1]) * self.cols + coords[0] - 1
+
+    def coords(self, square: int) -> list:
+        """ Return the coordinates (x, y) of a square. (reverse of square()) """
+        i, j = divmod(square, self.cols)
+        return [j + 1, self.rows - i]
+
+    def is_tour(self, tour: list) -> bool:
+        """ Return True if the list of squares is a knight's tour: every square of the board is visited exactly once
+        and every square is a knight move away from the one before it. Takes linear time in the number of squares. """
+        if len(tour) != self.size:
+            return False
+        visited = bytearray(self.size)
+        previous = None
+        for square in tour:
+            if not 0 <= square < self.size or visited[square]:
+                return False
+            if previous is not None and square not in self.neighbours[previous]:
+                return False
+            visited[square] = 1
+            previous = square
+        return True
+
+
+def mirror_tour(cols: int, rows: int, tour: list, flip_rows: bool, flip_cols: bool) -> list:
+    """ Return a tour of a board reflected top to bottom (flip_rows) and/or left to right (flip_cols). A reflection
+    turns knight moves into knight moves, so the result is a tour of the same board. """
+    mirrored = []
+    for square in tour:
+        i, j = divmod(square, cols)
+        if flip_rows:
+            i = rows - 1 - i
+        if flip_cols:
+            j = cols - 1 - j
+        mirrored.append(i * cols + j)
+    return mirrored
+
+
+def board_has_tour(cols: int, rows: int) -> bool:
+    """ Return True if there is an (open) knight's tour on a board with the given dimensions.
+    Every board has one, except for boards with a side of 1 (other than 1x1) or 2, the 3x3, 3x5, 3x6 and 4x4 boards. """
+    short_side, long_side = sorted((cols, rows))
+    if short_side == 1:
+        return long_side == 1
+    if short_side == 2:
+        return False
+    if short_side == 3:
+        return long_side not in (3, 5, 6)
+    if short_side == 4:
+        return long_side != 4
+    return True
+
+
+def is_possible_start(cols: int, rows: int, coords: list) -> bool:
+    """ Return False if there is no knight's tour from the given coordinates (x, y), without searching for one.
+    Otherwise there is a tour on the board, and there may (but doesn't have to) be one from these coordinates.
+
+    A knight changes the colour of its square with every move. On a board with an odd number of squares there is one
+    square more of the colour of the corners, so a tour has to start and end on that colour.
+    On a board with 4 rows, the squares of the two outer rows can only be reached from the two inner rows. A tour
+    can't alternate between them all the way, because then all outer squares would have the same colour. So the two
+    outer squares next to each other in the tour are its start and end, and a tour has to start on an outer row.
+    The same goes for the columns of a board with 4 columns. """
+    if not board_has_tour(cols, rows):
+        return False
+    x, y = coords
+    if cols * rows % 2 == 1 and (x + y) % 2 == 1:
+        return False
+    if rows == 4 and y not in (1, rows):
+        return False
+    if cols == 4 and x not in (1, cols):
+        return False
+    return True
+
+
+class BitboardSolver:
+    """ A solver for the knight's tour based on Warnsdorff's rule, with backtracking if the knight runs into a dead end.
+    The visited squares are stored as the bits of a single integer, so finding the free neighbours of a square and
+    counting their onward moves (the degree) are bit operations on the precomputed masks of KnightMoves. """
+
+    def __init__(self, moves: KnightMoves):
+        self.moves = moves
+        # The number of moves made by the last search, including the ones that were taken back
+        self.nodes = 0
+
+    def solve(self, start: int, node_limit: int = None):
+        """ Return a list of the squares of a knight's tour from the start square, in the order they are visited.
+        Return None if there is no tour from the start square, or if the search made more than node_limit moves.
+        The search uses its own stack instead of recursion, so it isn't limited by the recursion limit. """
+        size = self.moves.size
+        visited = 1 << start
+        self.nodes = 1
+        tour = [start]
+        # The untried next squares of every square in the tour, the one with the lowest degree at the end
+        candidates = [self.ordered_moves(start, visited)]
+        while tour:
+            if len(tour) == size:
+                return tour
+            if not candidates[-1]:
+                # Dead end, go back one move
+                candidates.pop()
+                visited ^= 1 << tour.pop()
+                continue
+            if node_limit and self.nodes >= node_limit:
+                return None
+            square = candidates[-1].pop()
+            visited |= 1 << square
+            self.nodes += 1
+            tour.append(square)
+            candidates.append(self.ordered_moves(square, visited))
+        return None
+
+    def ordered_moves(self, square: int, visited: int) -> list:
+        """ Return the free neighbours of a square, sorted by their degree from highest to lowest. """
+        masks = self.moves.masks
+        free = masks[square] & ~visited
+        moves = []
+        while free:
+            lowest_bit = free & -free
+            neighbour = lowest_bit.bit_length() - 1
+            moves.append(((masks[neighbour] & ~visited).bit_count(), neighbour))
+            free ^= lowest_bit
+        moves.sort(reverse=True)
+        return [neighbour for _, neighbour in moves]
+
+
+class DegreeSolver:
+    """ A solver for the knight's tour based on Warnsdorff's rule, with backtracking if the knight runs into a dead end.
+    The number of free neighbours (the degree) of every square is kept in a table, that is updated incrementally:
+    visiting a square decrements the degrees of its neighbours and going back restores them. Every move only
+    touches the up to 8 neighbours of a square, so a tour without dead ends takes linear time in the board size.
+
+    Ties between squares with the same degree are broken by one of the TIE_BREAKS:
+    - "roth": move to the square farthest from the centre of the board first (Roth's rule)
+    - "pohl": apply Warnsdorff's rule again one move ahead: move to the square with the free neighbour of the lowest
+      degree first (Pohl's rule), then to the square that comes first on the board
+    - "squirrel_cull": move in the first direction of a fixed order of the 8 knight moves, like Squirrel and Cull's
+      algorithm does (with a single order instead of the paper's order changes along the tour)
+    - "order": move to the square that comes first on the board
+    Breaking ties by the order of the squares leads into dead ends on boards from about 100x100 on, which makes the
+    backtracking explode. """
+
+    TIE_BREAKS = ("roth", "pohl", "squirrel_cull", "order")
+    # The order of the directions for "squirrel_cull", as offsets (rows, columns) like KnightMoves.OFFSETS.
+    # Out of the 16 circular orders, this is one of those that solve square boards up to at least 300x300 from the
+    # top left corner without backtracking.
+    DIRECTION_ORDER = ((1, 2), (-1, 2), (-2, 1), (-2, -1), (-1, -2), (1, -2), (2, -1), (2, 1))
+
+    def __init__(self, moves: KnightMoves, tie_break: str = "roth"):
+        if tie_break not in self.TIE_BREAKS:
+            raise ValueError(f"Unknown tie break \"{tie_break}\", use one of {', '.join(self.TIE_BREAKS)}")
+        self.moves = moves
+        self.tie_break = tie_break
+        # The number of moves made by the last search, including the ones that were taken back
+        self.nodes = 0
+        # The tie break key of every neighbour of every square, in the order of moves.neighbours (lowest is best).
+        # Pohl's rule depends on the visited squares, so it is calculated during the search instead.
+        self.tie_break_keys = []
+        if tie_break != "pohl":
+            for square in range(moves.size):
+                self.tie_break_keys.append(tuple(self._tie_break_key(square, neighbour)
+                                                 for neighbour in moves.neighbours[square]))
+
+    def solve(self, start: int, node_limit: int = None):
+        """ Return a list of the squares of a knight's tour from the start square, in the order they are visited.
+        Return None if there is no tour from the start square, or if the search made more than node_limit moves. """
+        neighbours = self.moves.neighbours
+        size = self.moves.size
+        degrees = [len(square_neighbours) for square_neighbours in neighbours]
+        visited = bytearray(size)
+        self.nodes = 1
+
+        self._visit(start, visited, degrees)
+        tour = [start]
+        # The untried next squares of every square in the tour, the best one at the end
+        candidates = [self.ordered_moves(start, visited, degrees)]
+        while tour:
+            if len(tour) == size:
+                return tour
+            if not candidates[-1]:
+                # Dead end, go back one move
+                candidates.pop()
+                self._leave(tour.pop(), visited, degrees)
+                continue
+            if node_limit and self.nodes >= node_limit:
+                return None
+            square = candidates[-1].pop()
+            self._visit(square, visited, degrees)
+            self.nodes += 1
+            tour.append(square)
+            candidates.append(self.ordered_moves(square, visited, degrees))
+        return None
+
+    def ordered_moves(self, square: int, visited: bytearray, degrees: list) -> list:
+        """ Return the free neighbours of a square, sorted from the worst to the best next move. """
+        neighbours = self.moves.neighbours[square]
+        if self.tie_break == "pohl":
+            moves = [(degrees[neighbour], self._lookahead_degree(neighbour, visited, degrees), neighbour)
+                     for neighbour in neighbours if not visited[neighbour]]
+        else:
+            moves = [(degrees[neighbour], key, neighbour)
+                     for neighbour, key in zip(neighbours, self.tie_break_keys[square]) if not visited[neighbour]]
+        moves.sort(reverse=True)
+        return [neighbour for _, _, neighbour in moves]
+
+    def _tie_break_key(self, square: int, neighbour: int) -> int:
+        """ Return the key of the static tie breaks for a move from a square to its neighbour. """
+        if self.tie_break == "order":
+            return neighbour
+        i, j = divmod(neighbour, self.moves.cols)
+        if self.tie_break == "roth":
+            # The squared distance from the centre, times 4 to stay an int
+            return -((2 * i - self.moves.rows + 1) ** 2 + (2 * j - self.moves.cols + 1) ** 2)
+        square_i, square_j = divmod(square, self.moves.cols)
+        return self.DIRECTION_ORDER.index((i - square_i, j - square_j))
+
+    def _lookahead_degree(self, square: int, visited: bytearray, degrees: list) -> int:
+        """ Return the lowest degree of the free neighbours of a square, or 9 (more than any degree) if it has none. """
+        return min((degrees[neighbour] for neighbour in self.moves.neighbours[square] if not visited[neighbour]),
+                   default=9)
+
+    def _visit(self, square: int, visited: bytearray, degrees: list) -> None:
+        """ Mark a square as visited and decrement the degrees of its neighbours. """
+        visited[square] = 1
+        for neighbour in self.moves.neighbours[square]:
+            degrees[neighbour] -= 1
+
+    def _leave(self, square: int, visited: bytearray, degrees: list) -> None:
+        """ Undo _visit() for a square. """
+        visited[square] = 0
+        for neighbour in self.moves.neighbours[square]:
+            degrees[neighbour] += 1
+
+
+class PathSolver(DegreeSolver):
+    """ A DegreeSolver for knight's paths, that visit every square of a board and end on a given square. """
+
+    def __init__(self, moves: KnightMoves, end: int, tie_break: str = "roth"):
+        super().__init__(moves, tie_break)
+        self.end = end
+        self.visited_count = 0
+
+    def solve(self, start: int, node_limit: int = None):
+        """ Return a list of the squares of a knight's path from the start square to the end square, in the order
+        they are visited. Return None if there is no such path, or if the search made more than node_limit moves. """
+        self.visited_count = 0
+        return super().solve(start, node_limit)
+
+    def ordered_moves(self, square: int, visited: bytearray, degrees: list) -> list:
+        """ Return the free neighbours of a square, sorted from the worst to the best next move.
+        The end square is only returned as the last move, and no square is returned if the end square can't be
+        reached anymore. """
+        moves = super().ordered_moves(square, visited, degrees)
+        if self.visited_count == self.moves.size - 1:
+            return moves
+        if degrees[self.end] == 0:
+            return []
+        return [move for move in moves if move != self.end]
+
+    def _visit(self, square: int, visited: bytearray, degrees: list) -> None:
+        super()._visit(square, visited, degrees)
+        self.visited_count += 1
+
+    def _leave(self, square: int, visited: bytearray, degrees: list) -> None:
+        super()._leave(square, visited, degrees)
+        self.visited_count -= 1
+
+
+class TourBuilder:
+    """ A builder for open knight's tours on large boards, that divides the board into small blocks instead of
+    searching the whole board at once.
+
+    The board is divided into blocks of 6 to 11 rows and columns (5 on a side of 5 squares), which are toured one after
+    another in a snake pattern: left to right in the first row of blocks, right to left in the second one and so on. The
+    knight visits every square of a block, from an entry square to an exit square one knight move away from the entry
+    square of the next block. These paths are searched on the small block alone and cached by the block's size, entry
+    and exit, so a board made of blocks of a few sizes takes only a handful of searches, no matter how large it is.
+
+    The tours start in the top left corner (square 0) and use the square numbers of KnightMoves, so they can be
+    written to a Chessboard with Chessboard.fill_tour(). Closed tours are not supported. """
+
+    MIN_BLOCK_SIZE = 6
+    MAX_BLOCK_SIZE = 11
+    BLOCK_SIZE = 8
+    # The maximum number of nodes of a search in a block, before the next exit is tried instead
+    NODE_LIMIT = 20000
+
+    def __init__(self):
+        # {(rows, cols, entry, exit): path or None, ...}, exit is None for the last block
+        self.paths = {}
+        # {(rows, cols): KnightMoves, ...}
+        self.block_moves = {}
+
+    def build(self, cols: int, rows: int):
+        """ Return a list of the squares of an open knight's tour of a board, starting in the top left corner.
+        Return None if the board is smaller than 5x5 or if no tour was found. """
+        if cols < 5 or rows < 5:
+            return None
+        blocks = self.divide(cols, rows)
+        paths = self._find_paths(blocks)
+        if paths is None:
+            return None
+
+        tour = []
+        for (top, left, block_rows, block_cols), path in zip(blocks, paths):
+            first_square = top * cols + left
+            tour.extend(first_square + i * cols + j for i, j in (divmod(square, block_cols) for square in path))
+        return tour
+
+    def divide(self, cols: int, rows: int) -> list:
+        """ Return the blocks of a board as tuples (top, left, rows, cols), in the order they are toured. """
+        heights = self._split(rows)
+        widths = self._split(cols)
+        lefts = [sum(widths[:n]) for n in range(len(widths))]
+        blocks = []
+        top = 0
+        for block_row, height in enumerate(heights):
+            order = range(len(widths)) if block_row % 2 == 0 else reversed(range(len(widths)))
+            blocks += [(top, lefts[n], height, widths[n]) for n in order]
+            top += height
+        return blocks
+
+    def block_path(self, rows: int, cols: int, entry: int, exit_square):
+        """ Return a knight's path through all squares of a block from the entry to the exit square (or to any
+        square if exit_square is None), or None if none was found. The squares are numbered within the block. """
+        key = (rows, cols, entry, exit_square)
+        if key not in self.paths:
+            if (rows, cols) not in self.block_moves:
+                self.block_moves[rows, cols] = KnightMoves(cols, rows)
+            moves = self.block_moves[rows, cols]
+            solver = DegreeSolver(moves) if exit_square is None else PathSolver(moves, exit_square)
+            self.paths[key] = solver.solve(entry, self.NODE_LIMIT)
+        return self.paths[key]
+
+    def _find_paths(self, blocks: list):
+        """ Return a path for every block, that ends next to the entry of the following block, or None.
+        If there is no path through a block from its entry, the search goes back to the block before. The entries
+        that failed are remembered, so no block is searched twice from the same entry. """
+        paths = []
+        failed_entries = set()
+        # The entry square of every block with a path so far and an iterator over its possible exits
+        stack = [(0, self._exits(blocks, 0, 0))]
+        while stack:
+            block_index = len(stack) - 1
+            entry, exits = stack[-1]
+            _, _, rows, cols = blocks[block_index]
+            if block_index == len(blocks) - 1:
+                path = self.block_path(rows, cols, entry, None)
+                if path is not None:
+                    paths.append(path)
+                    return paths
+            else:
+                for exit_square, next_entry in exits:
+                    if (block_index + 1, next_entry) in failed_entries:
+                        continue
+                    path = self.block_path(rows, cols, entry, exit_square)
+                    if path is not None:
+                        paths.append(path)
+                        stack.append((next_entry, self._exits(blocks, block_index + 1, next_entry)))
+                        break
+                else:
+                    path = None
+            if path is None:
+                failed_entries.add((block_index, entry))
+                stack.pop()
+                if paths:
+                    paths.pop()
+        return None
+
+    @staticmethod
+    def _exits(blocks: list, block_index: int, entry: int):
+        """ Generate the pairs (exit, next_entry) of a block and the following block, that are one knight move apart
+        and might be the ends of a path through the block from the entry square. Squares are numbered within their
+        block. """
+        if block_index == len(blocks) - 1:
+            return
+        top, left, rows, cols = blocks[block_index]
+        next_top, next_left, next_rows, next_cols = blocks[block_index + 1]
+        entry_color = sum(divmod(entry, cols)) % 2
+        for square in range(rows * cols):
+            if square == entry:
+                continue
+            i, j = divmod(square, cols)
+            # A path through all squares alternates colors. On an even number of squares it ends on the other
+            # color than it starts, on an odd number it starts and ends on the color of the corners.
+            if (rows * cols) % 2 == 0 and (i + j) % 2 == entry_color:
+                continue
+            if (rows * cols) % 2 == 1 and (i + j) % 2 == 1:
+                continue
+            for x, y in KnightMoves.OFFSETS:
+                next_i, next_j = top + i + x - next_top, left + j + y - next_left
+                if not (0 <= next_i < next_rows and 0 <= next_j < next_cols):
+                    continue
+                if (next_rows * next_cols) % 2 == 1 and (next_i + next_j) % 2 == 1:
+                    continue
+                yield square, next_i * next_cols + next_j
+
+    def _split(self, length: int) -> list:
+        """ Return the sizes of the blocks along one side of a board. """
+        sizes = []
+        while length > self.MAX_BLOCK_SIZE:
+            size = self.BLOCK_SIZE if length - self.BLOCK_SIZE >= self.MIN_BLOCK_SIZE else length - self.MIN_BLOCK_SIZE
+            sizes.append(size)
+            length -= size
+        sizes.append(length)
+        return sizes
+
+
+# The solvers benchmark() can compare: DegreeSolver with every tie break, BitboardSolver, which breaks ties by the
+# order of the squares, and TourBuilder, which doesn't search the whole board
+ENGINES = ("degree", "bitboard", "builder")
+
+
+def benchmark(sizes: list, tie_breaks: tuple = DegreeSolver.TIE_BREAKS, node_factor: int = 10,
+              engines: tuple = ("degree",)) -> None:
+    """ Print a table of the nodes (moves made, including the ones taken back) and the time it takes each engine
+    to find a tour from the top left corner of square boards, with each tie break for DegreeSolver.
+
+    :param sizes: A list of the side lengths of the boards.
+    :param tie_breaks: (optional) The tie breaks of DegreeSolver to compare. Defaults to all of them.
+    :param node_factor: (optional) A search is given up after node_factor times the number of squares nodes.
+        Defaults to 10.
+    :param engines: (optional) The engines to compare, out of ENGINES. Defaults to DegreeSolver only.
+    """
+    print(f"{'board':>11}  {'engine':<10}{'tie break':<14}{'solved':>8}{'nodes':>12}{'seconds':>10}")
+    for size in sizes:
+        moves = KnightMoves(size, size)
+        solvers = []
+        if "degree" in engines:
+            solvers += [("degree", tie_break, DegreeSolver(moves, tie_break)) for tie_break in tie_breaks]
+        if "bitboard" in engines:
+            solvers.append(("bitboard", "order", BitboardSolver(moves)))
+        if "builder" in engines:
+            solvers.append(("builder", "-", TourBuilder()))
+        for engine, tie_break, solver in solvers:
+            start = time.perf_counter()
+            if engine == "builder":
+                # The blocks are searched with their own node limit, see TourBuilder.NODE_LIMIT
+                tour = solver.build(size, size)
+                nodes = "-"
+            else:
+                tour = solver.solve(0, node_factor * moves.size)
+                nodes = solver.nodes
+            seconds = time.perf_counter() - start
+            board = f"{size}x{size}"
+            solved = tour is not None and moves.is_tour(tour)
+            print(f"{board:>11}  {engine:<10}{tie_break:<14}{str(solved):>8}{nodes:>12}{seconds:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the knight's tour solver on square boards.")
+    parser.add_argument("sizes", nargs="*", type=int, default=[8, 20, 50, 100, 200],
+                        help="the side lengths of the boards (default: 8 20 50 100 200)")
+    parser.add_argument("-t", "--tie_break", choices=DegreeSolver.TIE_BREAKS, action="append",
+                        help="a tie break to benchmark, can be repeated (default: all)")
+    parser.add_argument("-e", "--engine", choices=ENGINES, action="append",
+                        help="an engine to benchmark, can be repeated (default: degree). The bitboard engine keeps a "
+                             "mask as long as the board for every square, so it needs a lot of memory on big boards. "
+                             "The builder engine builds the tour block by block, see TourBuilder")
+    args = parser.parse_args()
+    benchmark(args.sizes, tuple(args.tie_break or DegreeSolver.TIE_BREAKS), engines=tuple(args.engine or ("degree",)))
+
+
+if __name__ == "__main__":
+    main()
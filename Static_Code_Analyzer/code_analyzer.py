@@ -1,13 +1,34 @@
 import re
 import os
 import argparse
-import string
 import ast
+import io
+import sys
+import tokenize
+from functools import partial
+from time import perf_counter
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor
+from lint_cache import LintCache
+from profiler import AnalyzerStats
+from reporters import REPORTERS, TextReporter
+from watcher import Watcher
+
+
+class Finding(NamedTuple):
+    """An error found in a line of code. The name is only set for errors with a name in their message."""
+    line_nr: int
+    error_code: str
+    name: str = None
 
 
 class CodeAnalyzer:
     """A class to check the code in a file for errors."""
 
+    # Change the version whenever a check or the Finding changes, so that results cached by an older version are not
+    # used anymore.
+    RULESET_VERSION = "2"
+
     ERRORS = {"S001": "Too long",
               "S002": "Indentation is not a multiple of four",
               "S003": "Unnecessary semicolon after a statement",
@@ -25,143 +46,186 @@ class CodeAnalyzer:
                 "snake_case_var": re.compile(r"^_{0,2}[^A-Z^_]+?(_?[^A-Z^_])*?$"),
                 "CamelCase": re.compile(r"^([A-Z][a-z\d]+)+$")}
 
-    def __init__(self, code_file_path):
+    LINE_PATTERNS = {"indentation": re.compile(r"^( {4})*[^ ]"),
+                     "inline_comment": re.compile(r"^[^#]+(?<=[^ ]) ?#"),
+                     "todo": re.compile(r"^[^#]*#.*?todo", flags=re.IGNORECASE)}
+
+    # The checks of every line, in the order they are run on a line. See _check_lines().
+    LINE_CHECKS = (("_check_line_length", "S001"),
+                   ("_check_indentation", "S002"),
+                   ("_check_semicolons", "S003"),
+                   ("_check_spaces_inline_comments", "S004"),
+                   ("_check_todo_found", "S005"),
+                   ("_check_blank_line", "S006"),
+                   ("_check_construction_spaces", "S007"))
+
+    # The checks of the syntax tree, registered by the type of node they check. The tree is walked only once
+    # for all of them, see _check_tree(). Format: {node_type: ((method_name, error_code), ...), ...}
+    NODE_CHECKS = {ast.ClassDef: (("_check_class_name", "S008"),),
+                   ast.FunctionDef: (("_check_function_name", "S009"),
+                                     ("_check_arg_name", "S010"),
+                                     ("_check_default_arg_mutable", "S012")),
+                   ast.Assign: (("_check_var_name", "S011"),)}
+
+    def __init__(self, code_file_path, stats: AnalyzerStats = None):
+        """
+        :param code_file_path: The path to the file, relative to the parent directory of the analyzer.
+        :param stats: (optional) An AnalyzerStats to record the time of every rule and phase in. Without it, the
+            analysis is not timed at all.
+        """
         self.path = code_file_path
-        self.code_file_path = os.path.join(os.path.abspath(__file__), "..\\..\\", self.path)
-        self.errors_found = {}
+        self.code_file_path = resolve_path(self.path)
+        self.stats = stats
+        self.errors_found = []
         self.tree = None
+        self.previous_blank_lines = 0
 
     def analyze_code(self) -> None:
-        """Analyze the code of a file."""
-        file = open(self.code_file_path, "r")
-        code = file.read()
-        file.close()
-        self.tree = ast.parse(code)
-
-        with open(self.code_file_path, "r") as code_file:
-            previous_blank_lines = 0
-            for i, line in enumerate(code_file, start=1):
-                self._check_line_length(line, i, "S001")
-                self._check_indentation(line, i, "S002")
-                self._check_semicolons(line, i, "S003")
-                self._check_spaces_inline_comments(line, i, "S004")
-                self._check_todo_found(line, i, "S005")
-                previous_blank_lines = self._check_blank_line(line, i, "S006", previous_blank_lines)
-                self._check_construction_spaces(line, i, "S007")
-            self._check_class_name("S008")
-            self._check_function_name("S009")
-            self._check_arg_name("S010")
-            self._check_var_name("S011")
-            self._check_default_arg_mutable("S012")
+        """Analyze the code of a file. The file is read only once, for parsing and for checking its lines."""
+        if self.stats is not None:
+            self._analyze_code_profiled()
+            return
+        with open(self.code_file_path, "rb") as code_file:
+            source = code_file.read()
+        self.tree = ast.parse(source)
+        self._check_lines(self._decode(source))
+        self._check_tree()
+
+    def _analyze_code_profiled(self) -> None:
+        """Analyze the code like analyze_code() and record the time of every phase and of the file in self.stats."""
+        start = perf_counter()
+        with open(self.code_file_path, "rb") as code_file:
+            source = code_file.read()
+        read_end = perf_counter()
+        self.tree = ast.parse(source)
+        parse_end = perf_counter()
+        self._check_lines(self._decode(source))
+        lines_end = perf_counter()
+        self._check_tree()
+        end = perf_counter()
+
+        phase_times = self.stats.phase_times
+        phase_times["read"] += read_end - start
+        phase_times["parse"] += parse_end - read_end
+        phase_times["lines"] += lines_end - parse_end
+        phase_times["tree"] += end - lines_end
+        self.stats.file_times[self.path] = end - start
+
+    def _get_check(self, check: str, error_code: str):
+        """Return the check method with the given name. If the analyzer is profiled, the method is wrapped to
+        record its time."""
+        method = getattr(self, check)
+        if self.stats is None:
+            return method
+        return self.stats.timed(error_code, method)
+
+    @staticmethod
+    def _decode(source: bytes) -> io.StringIO:
+        """Return the lines of the source code, decoded like the python interpreter does and with universal
+        newlines, like a file opened in text mode."""
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(source).readline)
+        return io.StringIO(source.decode(encoding), newline=None)
+
+    def _check_lines(self, lines) -> None:
+        """Run all the checks in LINE_CHECKS on every line."""
+        checks = [(self._get_check(check, error_code), error_code) for check, error_code in self.LINE_CHECKS]
+        self.previous_blank_lines = 0
+        for i, line in enumerate(lines, start=1):
+            for check, error_code in checks:
+                check(line, i, error_code)
 
     def print_errors(self):
-        """Print all the errors found and stored in self.errors_found.
+        """Print all the errors found and stored in self.errors_found, sorted by line and error code.
 
         Format: path: line line_nr: error_code error_msg"""
-        for key in sorted(list(self.errors_found.keys())):
-            for error in self.errors_found[key]:
-                if len(error) == 1:
-                    print(f"{self.path}: Line {key}: {error[0]} {self.ERRORS[error[0]]}")
-                else:
-                    template = string.Template(self.ERRORS[error[0]])
-                    msg = template.substitute(name=error[1])
-                    print(f"{self.path}: Line {key}: {error[0]} {msg}")
+        TextReporter(self.ERRORS).report(self.path, self.errors_found)
 
     def _check_line_length(self, line: str, i: int, error_code) -> None:
         """Add an error if a line is longer than 79 characters."""
         if len(line) > 79:
             self._add_error(i, error_code)
-    
+
     def _check_indentation(self, line: str, i: int, error_code) -> None:
         """Add an error if an indentation is not a multiple of four."""
-        if not re.match(r"^( {4})*[^ ]", line):
+        if not self.LINE_PATTERNS["indentation"].match(line):
             self._add_error(i, error_code)
 
     def _check_semicolons(self, line: str, i: int, error_code) -> None:
         """Add an error if an unnecessary semicolon is found."""
         if ";" in line:
-            line = line.split(";")
+            line = line.split(";", 1)
             if "#" not in line[0] and line[0].count("'") % 2 == 0:
                 self._add_error(i, error_code)
 
     def _check_spaces_inline_comments(self, line: str, i: int, error_code) -> None:
         """Add an error there are less than two spaces before an inline comment."""
-        if re.search(r"^[^#]+(?<=[^ ]) ?#", line):
+        if "#" in line and self.LINE_PATTERNS["inline_comment"].search(line):
             self._add_error(i, error_code)
 
     def _check_todo_found(self, line: str, i: int, error_code) -> None:
         """Add an error if a "TODO" is found (not case sensitive)."""
-        if re.search(r"^[^#]*#.*?todo", line, flags=re.IGNORECASE):
+        if "#" in line and self.LINE_PATTERNS["todo"].search(line):
             self._add_error(i, error_code)
 
-    def _check_blank_line(self, line: str, i: int, error_code, previous_blank_lines: int) -> int:
-        """Return the number of previous blank lines.
+    def _check_blank_line(self, line: str, i: int, error_code) -> None:
+        """Count the blank lines in self.previous_blank_lines.
         Add an error if a non-blank line has more than two previous blank lines."""
-        if re.match(r"^\n$", line):
-            previous_blank_lines += 1
-        elif previous_blank_lines > 2:
+        if line == "\n":
+            self.previous_blank_lines += 1
+        elif self.previous_blank_lines > 2:
             self._add_error(i, error_code)
-            previous_blank_lines = 0
+            self.previous_blank_lines = 0
         else:
-            previous_blank_lines = 0
-        return previous_blank_lines
+            self.previous_blank_lines = 0
 
     def _check_construction_spaces(self, line: str, i: int, error_code) -> None:
         """Add en error with the function or class constructor if there are more or less than one space."""
-        if re.search(r"(?<=class ) ", line):
+        if "class  " in line:
             self._add_error(i, error_code, "class")
-        elif re.search(r"(?<=def ) ", line):
+        elif "def  " in line:
             self._add_error(i, error_code, "def")
 
-    def _check_class_name(self, error_code) -> None:
-        """Add an error with the class' name if a class' name is not written in CamelCase."""
+    def _check_tree(self) -> None:
+        """Run all the checks registered in NODE_CHECKS in a single walk through the syntax tree."""
+        checks = {node_type: [(self._get_check(check, error_code), error_code) for check, error_code in node_checks]
+                  for node_type, node_checks in self.NODE_CHECKS.items()}
         for node in ast.walk(self.tree):
-            if isinstance(node, ast.ClassDef):
-                if not re.match(self.PATTERNS["CamelCase"], node.name):
-                    self._add_error(node.lineno, error_code, node.name)
+            node_checks = checks.get(type(node))
+            if node_checks:
+                for check, error_code in node_checks:
+                    check(node, error_code)
 
-    def _check_function_name(self, error_code) -> None:
+    def _check_class_name(self, node: ast.ClassDef, error_code) -> None:
+        """Add an error with the class' name if a class' name is not written in CamelCase."""
+        if not re.match(self.PATTERNS["CamelCase"], node.name):
+            self._add_error(node.lineno, error_code, node.name)
+
+    def _check_function_name(self, node: ast.FunctionDef, error_code) -> None:
         """Add an error with the function's name if a function's name is not written in snake_case."""
-        for node in ast.walk(self.tree):
-            if isinstance(node, ast.FunctionDef):
-                if not re.match(self.PATTERNS["snake_case_func"], node.name):
-                    self._add_error(node.lineno, error_code, node.name)
+        if not re.match(self.PATTERNS["snake_case_func"], node.name):
+            self._add_error(node.lineno, error_code, node.name)
 
-    def _check_arg_name(self, error_code) -> None:
+    def _check_arg_name(self, node: ast.FunctionDef, error_code) -> None:
         """Add an error with the argument's name if an argument's name is not written in snake_case."""
-        for node in ast.walk(self.tree):
-            if not isinstance(node, ast.FunctionDef):
-                continue
-            for arg in node.args.args:
-                if not re.match(self.PATTERNS["snake_case_var"], arg.arg):
-                    self._add_error(node.lineno, error_code, arg.arg)
+        for arg in node.args.args:
+            if not re.match(self.PATTERNS["snake_case_var"], arg.arg):
+                self._add_error(node.lineno, error_code, arg.arg)
 
-    def _check_var_name(self, error_code) -> None:
+    def _check_var_name(self, node: ast.Assign, error_code) -> None:
         """Add an error with the variable's name if a variable's name is not written in snake_case."""
-        for node in ast.walk(self.tree):
-            if not isinstance(node, ast.Assign):
+        for name in node.targets:
+            if not isinstance(name, ast.Name):
                 continue
-            for name in node.targets:
-                if not isinstance(name, ast.Name):
-                    continue
-                if not re.match(self.PATTERNS["snake_case_var"], name.id):
-                    self._add_error(node.lineno, error_code, name.id)
+            if not re.match(self.PATTERNS["snake_case_var"], name.id):
+                self._add_error(node.lineno, error_code, name.id)
 
-    def _check_default_arg_mutable(self, error_code) -> None:
+    def _check_default_arg_mutable(self, node: ast.FunctionDef, error_code) -> None:
         """Add an error if a mutable default argument is found."""
-        for node in ast.walk(self.tree):
-            if not isinstance(node, ast.FunctionDef):
-                continue
-            
-            for el in node.args.defaults:
-                if not (isinstance(el, ast.List) or isinstance(el, ast.Set) or isinstance(el, ast.Dict)):
-                    continue
-
-                if node.lineno not in list(self.errors_found.keys()):
-                    self._add_error(node.lineno, error_code)
-
-                if not [error_code] in self.errors_found[node.lineno]:
-                    self._add_error(node.lineno, error_code)
+        for el in node.args.defaults:
+            if isinstance(el, ast.List) or isinstance(el, ast.Set) or isinstance(el, ast.Dict):
+                # Only one error per function
+                self._add_error(node.lineno, error_code)
+                break
 
     def _add_error(self, line_nr: int, error_code: str, value_name: str = None) -> None:
         """Create and add an error to self.errors_found.
@@ -170,40 +234,113 @@ class CodeAnalyzer:
         :param error_code: A string representing the error code.
         :param value_name : (Optional) A string representing the name of a value. Defaults to None.
         """
-        if value_name is None:
-            self.errors_found.setdefault(line_nr, []).append([error_code])
-        else:
-            self.errors_found.setdefault(line_nr, []).append([error_code])
-            index = self._get_index(line_nr, error_code)
-            self.errors_found[line_nr][index].append(value_name)
-
-    def _get_index(self, key: int, error_code: str) -> int:
-        """Return index of error_code in self.errors_found[key]."""
-        for element in self.errors_found[key]:
-            if error_code in element:
-                return self.errors_found[key].index(element)
-        else:
-            raise ValueError(f"{error_code} not in self.errors_found[{key}]")
+        self.errors_found.append(Finding(line_nr, error_code, value_name))
 
     def __repr__(self):
         return f"CodeAnalyzer(code_file_path={self.path})"
 
 
-def parse_args() -> str:
-    """Return the parsed argument."""
+def parse_args() -> argparse.Namespace:
+    """Return the parsed arguments."""
     parser = argparse.ArgumentParser()
     parser.add_argument("directory_or_file_path", help="The path to a directory \
     that contains the python files you want to analyze.")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="The number of processes used to analyze \
+    the files of a directory. Defaults to the number of CPUs.")
+    parser.add_argument("--cache-dir", help="A directory to cache the errors in. Files that didn't change since \
+    they were last analyzed are not analyzed again.")
+    parser.add_argument("-f", "--format", choices=REPORTERS, default="text", help="The output format. \
+    Defaults to text.")
+    parser.add_argument("--profile", action="store_true", help="Time every rule, file and phase of the analysis \
+    and print a summary of the slowest ones to stderr.")
+    parser.add_argument("-w", "--watch", action="store_true", help="Keep running and analyze the files again \
+    whenever they change. Only the errors that were added or fixed are printed.")
+    parser.add_argument("--interval", type=float, default=0.2, help="The number of seconds between two checks \
+    for changed files in watch mode. Defaults to 0.2.")
     args = parser.parse_args()
-    path = args.directory_or_file_path
-
-    return path
+    if args.watch and args.format not in ("text", "compact"):
+        parser.error("--watch only supports the text and compact formats")
+    return args
+
+
+def resolve_path(path: str) -> str:
+    """Return the path to a file or directory, given relative to the parent directory of the analyzer."""
+    return os.path.join(os.path.abspath(__file__), "..\\..\\", path)
+
+
+def find_python_files(directory: str) -> list:
+    """Return the paths of all python files in a directory and its subdirectories, relative to the directory.
+
+    The paths are sorted, so that the files are always analyzed and printed in the same order."""
+    python_files = []
+    directories = [directory]
+    while directories:
+        current_directory = directories.pop()
+        with os.scandir(current_directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.name.endswith(".py") and entry.is_file():
+                    python_files.append(os.path.relpath(entry.path, directory))
+    return sorted(python_files)
+
+
+def analyze_file(path: str, profile: bool = False) -> CodeAnalyzer:
+    """Return a CodeAnalyzer for the file, after it has analyzed the file's code. If profile is True, the analyzer
+    records its timings in code_analyzer.stats.
+
+    The syntax tree is dropped, so that only the errors have to be sent back from a worker process."""
+    code_analyzer = CodeAnalyzer(path, AnalyzerStats() if profile else None)
+    code_analyzer.analyze_code()
+    code_analyzer.tree = None
+    return code_analyzer
+
+
+def analyze_files(paths: list, jobs: int = None, cache: LintCache = None, profile: bool = False):
+    """Analyze the files and yield a CodeAnalyzer for every file. The results are yielded in the order of the paths.
+
+    Files found in the cache are not analyzed again. All the other files are analyzed in a pool of processes,
+    and their results are added to the cache. If profile is True, the analyzed files' CodeAnalyzers have stats."""
+    cached_analyzers = {}
+    if cache:
+        for path in paths:
+            code_analyzer = CodeAnalyzer(path)
+            errors = cache.get(code_analyzer.code_file_path)
+            if errors is not None:
+                code_analyzer.errors_found = [Finding(*error) for error in errors]
+                cached_analyzers[path] = code_analyzer
+
+    results = analyze_in_pool([path for path in paths if path not in cached_analyzers], jobs, profile)
+    for path in paths:
+        if path in cached_analyzers:
+            yield cached_analyzers[path]
+            continue
+        code_analyzer = next(results)
+        if cache:
+            cache.put(code_analyzer.code_file_path, code_analyzer.errors_found)
+        yield code_analyzer
+
+
+def analyze_in_pool(paths: list, jobs: int = None, profile: bool = False):
+    """Analyze the files in a pool of processes and yield a CodeAnalyzer for every file.
+
+    The results are yielded in the order of the paths, as soon as the file and all the files before it are done."""
+    analyze = partial(analyze_file, profile=profile)
+    if jobs == 1 or len(paths) < 2:
+        yield from map(analyze, paths)
+        return
+    jobs = jobs or os.cpu_count() or 1
+    # Send the files in chunks, so that small files don't spend most of their time in the pool's queues.
+    chunksize = max(1, min(64, len(paths) // (4 * jobs)))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(analyze, paths, chunksize=chunksize)
 
 
 def main():
 
     # Get a relative path to a file or a directory from argument
-    path = parse_args()
+    args = parse_args()
+    path = args.directory_or_file_path
 
     # # for testing
     # if path == "test_file.py":
@@ -213,22 +350,52 @@ def main():
     #     code_analyzer.print_errors()
 
     # Get the absolute path to the file/directory
-    abs_path = os.path.join(os.path.abspath(__file__), "..\\..\\", path)
+    abs_path = resolve_path(path)
 
     if os.path.isfile(abs_path):
-        code_analyzer = CodeAnalyzer(path)
-        code_analyzer.analyze_code()
-        code_analyzer.print_errors()
-
-    # If the path is for a directory, analyze the code of every python file it contains
+        def find_files():
+            return [path]
+    # If the path is for a directory, analyze the code of every python file in it and its subdirectories
     elif os.path.isdir(abs_path):
-        files = os.listdir(abs_path)
-        for file in files:
-            if file.endswith(".py"):
-                file_path = os.path.join(path, file)
-                code_analyzer = CodeAnalyzer(file_path)
-                code_analyzer.analyze_code()
-                code_analyzer.print_errors()
+        def find_files():
+            return [os.path.join(path, file) for file in find_python_files(abs_path)]
+    else:
+        return
+
+    cache = LintCache(args.cache_dir, CodeAnalyzer.RULESET_VERSION) if args.cache_dir else None
+    reporter = REPORTERS[args.format](CodeAnalyzer.ERRORS)
+    watcher = Watcher(find_files, lambda file_path: analyze_file(file_path).errors_found, reporter,
+                      resolve_path, args.interval)
+    # Take the first snapshot before the files are analyzed, so that changes made meanwhile are not missed
+    file_paths = watcher.poll() if args.watch else find_files()
+    stats = AnalyzerStats()
+    reporter.start()
+    try:
+        reported_paths = set()
+        try:
+            for code_analyzer in analyze_files(file_paths, args.jobs, cache, args.profile):
+                reporter.report(code_analyzer.path, code_analyzer.errors_found)
+                reported_paths.add(code_analyzer.path)
+                if code_analyzer.stats is not None:
+                    stats.merge(code_analyzer.stats)
+                if args.watch and code_analyzer.errors_found:
+                    watcher.errors_found[code_analyzer.path] = code_analyzer.errors_found
+        except SyntaxError:
+            if not args.watch:
+                raise
+            # A file can't be parsed yet. Analyze the files that weren't reported one by one, like after a change,
+            # so the broken file is reported and watched instead of ending the program.
+            for file_path in file_paths:
+                if file_path not in reported_paths:
+                    watcher.update(file_path)
+        reporter.finish()
+        if args.profile:
+            sys.stderr.write(stats.summary())
+        if args.watch:
+            watcher.run()
+    finally:
+        if cache:
+            cache.close()
 
 
 if __name__ == "__main__":
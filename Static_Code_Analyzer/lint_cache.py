@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+class LintCache:
+    """A persistent cache for the errors found in python files, stored in a SQLite database in a cache directory.
+
+    The errors are keyed by a hash of the file's content and the analyzer's rule set version, so a changed file or
+    changed rules never return old errors. The size and modification time of every file are stored as well, so an
+    unchanged file is found without reading it again. They don't depend on the rule set, so the whole cache is
+    cleared when it was written by another rule set version."""
+
+    FILE_NAME = "lint_cache.sqlite3"
+    # Files modified less than this many seconds before they were hashed are looked up by their hash on the next run
+    # again, because a modification in the same clock tick wouldn't change their modification time.
+    RACY_SECONDS = 2
+
+    def __init__(self, cache_dir: str, ruleset_version: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.ruleset_version = ruleset_version
+        # The size, modification time and digest of the files that weren't found, until their errors are stored
+        self.missing_files = {}
+        self.connection = sqlite3.connect(os.path.join(cache_dir, self.FILE_NAME))
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS results (digest TEXT PRIMARY KEY, errors TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL,
+                                              size INTEGER NOT NULL, digest TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        row = self.connection.execute("SELECT value FROM settings WHERE name = 'ruleset_version'").fetchone()
+        if row is None or row[0] != ruleset_version:
+            with self.connection:
+                self.connection.execute("DELETE FROM results")
+                self.connection.execute("DELETE FROM files")
+                self.connection.execute("INSERT OR REPLACE INTO settings VALUES ('ruleset_version', ?)",
+                                        (ruleset_version,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, path: str):
+        """Return the cached errors found in a file or None. The errors are returned as lists of their fields.
+
+        :param path: The path to a file.
+        """
+        stat = os.stat(path)
+        row = self.connection.execute("SELECT digest FROM files WHERE path = ? AND mtime_ns = ? AND size = ?",
+                                      (path, stat.st_mtime_ns, stat.st_size)).fetchone()
+        if row:
+            errors = self._get_errors(row[0])
+            if errors is not None:
+                return errors
+
+        with open(path, "rb") as file:
+            digest = self.digest(file.read())
+        errors = self._get_errors(digest)
+        if errors is None:
+            self.missing_files[path] = stat, digest
+        else:
+            self._set_file(path, stat, digest)
+        return errors
+
+    def put(self, path: str, errors: list) -> None:
+        """Store the errors found in a file, that wasn't found by get() before.
+        Nothing is stored if the file was changed since then, as the errors might be for either version of it.
+
+        :param path: The path to a file.
+        :param errors: The errors found in the file, as a list of tuples, like CodeAnalyzer.errors_found.
+        """
+        stat, digest = self.missing_files.pop(path)
+        new_stat = os.stat(path)
+        if (new_stat.st_mtime_ns, new_stat.st_size) != (stat.st_mtime_ns, stat.st_size):
+            return
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (digest, json.dumps(errors)))
+        self._set_file(path, stat, digest)
+
+    def digest(self, source: bytes) -> str:
+        """Return the digest of the source code of a file for the current rule set."""
+        return hashlib.blake2b(source, digest_size=20, person=self.ruleset_version.encode()[:16]).hexdigest()
+
+    def close(self) -> None:
+        """Save all changes and close the database."""
+        self.connection.commit()
+        self.connection.close()
+
+    def _get_errors(self, digest: str):
+        """Return the cached errors for a digest or None."""
+        row = self.connection.execute("SELECT errors FROM results WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def _set_file(self, path: str, stat: os.stat_result, digest: str) -> None:
+        """Store the size, modification time and digest of a file, unless it was modified just now."""
+        if time.time_ns() - stat.st_mtime_ns < self.RACY_SECONDS * 10 ** 9:
+            return
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                (path, stat.st_mtime_ns, stat.st_size, digest))
@@ -0,0 +1,62 @@
+from collections import defaultdict
+from time import perf_counter
+
+
+class AnalyzerStats:
+    """Timings collected while analyzing files: the wall time and number of calls of every rule, the time spent on
+    every file and the time spent in each phase of the analysis (reading, parsing, checking lines and the tree).
+
+    Stats of several CodeAnalyzers, e.g. from different worker processes, can be combined with merge()."""
+
+    PHASES = ("read", "parse", "lines", "tree")
+
+    def __init__(self):
+        self.rule_times = defaultdict(float)
+        self.rule_calls = defaultdict(int)
+        self.phase_times = defaultdict(float)
+        self.file_times = {}
+
+    def timed(self, error_code: str, check):
+        """Return a function that calls the check and records its time and calls for the error code."""
+        rule_times = self.rule_times
+        rule_calls = self.rule_calls
+
+        def timed_check(*args):
+            start = perf_counter()
+            check(*args)
+            rule_times[error_code] += perf_counter() - start
+            rule_calls[error_code] += 1
+
+        return timed_check
+
+    def merge(self, other: "AnalyzerStats") -> None:
+        """Add the timings of another AnalyzerStats to these."""
+        for error_code, seconds in other.rule_times.items():
+            self.rule_times[error_code] += seconds
+        for error_code, calls in other.rule_calls.items():
+            self.rule_calls[error_code] += calls
+        for phase, seconds in other.phase_times.items():
+            self.phase_times[phase] += seconds
+        self.file_times.update(other.file_times)
+
+    def summary(self, limit: int = 10) -> str:
+        """Return a table of the phases, the rules sorted by time and the slowest files.
+
+        :param limit: (optional) The maximum number of files in the table. Defaults to 10.
+        """
+        lines = [f"{'phase':<10}{'seconds':>10}"]
+        lines += [f"{phase:<10}{self.phase_times[phase]:>10.4f}" for phase in self.PHASES]
+
+        lines += ["", f"{'rule':<10}{'seconds':>10}{'calls':>10}{'us/call':>10}"]
+        for error_code in sorted(self.rule_times, key=self.rule_times.get, reverse=True):
+            seconds = self.rule_times[error_code]
+            calls = self.rule_calls[error_code]
+            lines.append(f"{error_code:<10}{seconds:>10.4f}{calls:>10}{seconds / calls * 10 ** 6:>10.2f}")
+
+        lines += ["", f"{'seconds':>10}  file"]
+        slowest_files = sorted(self.file_times, key=self.file_times.get, reverse=True)[:limit]
+        lines += [f"{self.file_times[path]:>10.4f}  {path}" for path in slowest_files]
+        return "\n".join(lines) + "\n"
+
+    def __repr__(self):
+        return f"AnalyzerStats(files={len(self.file_times)}, rules={len(self.rule_times)})"
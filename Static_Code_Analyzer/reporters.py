@@ -0,0 +1,107 @@
+import json
+import string
+import sys
+from operator import attrgetter
+
+
+class Reporter:
+    """A base class for reporters, that write the errors found in files to a stream, one file at a time.
+
+    Call start() once, then report() for every file as soon as it is analyzed and finish() after the last file.
+    The messages are prepared once per reporter, not once per error."""
+
+    def __init__(self, messages: dict, stream=None):
+        """
+        :param messages: A dictionary with the message for every error code, like CodeAnalyzer.ERRORS.
+        :param stream: (optional) A text stream to write to. Defaults to sys.stdout.
+        """
+        self.stream = stream or sys.stdout
+        self.messages = messages
+        self.templates = {error_code: string.Template(msg) for error_code, msg in messages.items() if "$" in msg}
+
+    def start(self) -> None:
+        """Write everything that comes before the errors of the first file."""
+
+    def report(self, path: str, errors: list) -> None:
+        """Write the errors found in a file, sorted by line and error code.
+
+        :param path: The path to the file.
+        :param errors: A list of the errors (Finding) found in the file.
+        """
+        lines = [self.format_error(path, error, self.message(error))
+                 for error in sorted(errors, key=attrgetter("line_nr", "error_code"))]
+        self.stream.write("".join(lines))
+
+    def finish(self) -> None:
+        """Write everything that comes after the errors of the last file."""
+        self.stream.flush()
+
+    def format_error(self, path: str, error, msg: str) -> str:
+        """Return the text written for a single error, including the line break."""
+        raise NotImplementedError
+
+    def message(self, error) -> str:
+        """Return the message for an error, with the error's name filled in."""
+        if error.name is None:
+            return self.messages[error.error_code]
+        return self.templates[error.error_code].substitute(name=error.name)
+
+
+class TextReporter(Reporter):
+    """Write the errors in this format: path: Line line_nr: error_code error_msg"""
+
+    def format_error(self, path: str, error, msg: str) -> str:
+        return f"{path}: Line {error.line_nr}: {error.error_code} {msg}\n"
+
+
+class CompactReporter(Reporter):
+    """Write the errors in the format of most other linters: path:line_nr: error_code error_msg"""
+
+    def format_error(self, path: str, error, msg: str) -> str:
+        return f"{path}:{error.line_nr}: {error.error_code} {msg}\n"
+
+
+class JsonLinesReporter(Reporter):
+    """Write every error as a JSON object on its own line."""
+
+    def format_error(self, path: str, error, msg: str) -> str:
+        return json.dumps({"path": path, "line": error.line_nr, "code": error.error_code, "message": msg}) + "\n"
+
+
+class SarifReporter(Reporter):
+    """Write all the errors as one SARIF 2.1.0 log. The results are written while the files are analyzed,
+    the log is only complete after finish()."""
+
+    SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+    def __init__(self, messages: dict, stream=None):
+        super().__init__(messages, stream)
+        self.first_result = True
+
+    def start(self) -> None:
+        rules = [{"id": error_code, "shortDescription": {"text": msg}} for error_code, msg in self.messages.items()]
+        header = json.dumps({"version": "2.1.0", "$schema": self.SCHEMA,
+                             "runs": [{"tool": {"driver": {"name": "code_analyzer", "rules": rules}},
+                                       "results": []}]})
+        # Write everything up to the start of the results list, the results and the closing brackets come later.
+        self.stream.write(header[:header.rindex("[]") + 1])
+
+    def format_error(self, path: str, error, msg: str) -> str:
+        result = json.dumps({"ruleId": error.error_code, "level": "warning", "message": {"text": msg},
+                             "locations": [{"physicalLocation": {
+                                 "artifactLocation": {"uri": path.replace("\\", "/")},
+                                 "region": {"startLine": error.line_nr}}}]})
+        if self.first_result:
+            self.first_result = False
+            return "\n" + result
+        return ",\n" + result
+
+    def finish(self) -> None:
+        self.stream.write("\n]}]}\n")
+        super().finish()
+
+
+REPORTERS = {"text": TextReporter,
+             "compact": CompactReporter,
+             "jsonl": JsonLinesReporter,
+             "sarif": SarifReporter}
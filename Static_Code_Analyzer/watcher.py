@@ -0,0 +1,85 @@
+import os
+import time
+from collections import Counter
+from operator import attrgetter
+
+
+class Watcher:
+    """Watch python files for changes and analyze only the files that changed.
+
+    The files are polled by comparing their modification time and size with the last poll. The errors of every file
+    are kept in memory, so after a change only the difference is printed: new errors with a leading "+ " and fixed
+    errors with a leading "- "."""
+
+    def __init__(self, find_files, analyze_file, reporter, resolve_path=os.path.abspath, interval: float = 0.2):
+        """
+        :param find_files: A function that returns the paths of all files to watch.
+        :param analyze_file: A function that takes a path and returns the errors (Finding) found in the file.
+        :param reporter: A Reporter to format the errors with.
+        :param resolve_path: (optional) A function that returns the path to a file on disk for a path returned by
+            find_files. Defaults to os.path.abspath.
+        :param interval: (optional) The number of seconds between two polls. Defaults to 0.2.
+        """
+        self.find_files = find_files
+        self.analyze_file = analyze_file
+        self.reporter = reporter
+        self.resolve_path = resolve_path
+        self.interval = interval
+        # {path: (mtime_ns, size), ...} of all files at the last poll, None for a file that couldn't be read
+        self.snapshots = {}
+        # {path: [Finding, ...], ...} for all analyzed files
+        self.errors_found = {}
+
+    def poll(self) -> list:
+        """Return the paths of all the files that were added, changed or removed since the last poll."""
+        snapshots = {}
+        for path in self.find_files():
+            try:
+                stat = os.stat(self.resolve_path(path))
+            except OSError:
+                continue
+            snapshots[path] = (stat.st_mtime_ns, stat.st_size)
+        changed_files = [path for path, snapshot in snapshots.items() if self.snapshots.get(path) != snapshot]
+        removed_files = [path for path in self.snapshots if path not in snapshots]
+        self.snapshots = snapshots
+        return changed_files + removed_files
+
+    def update(self, path: str) -> None:
+        """Analyze a file again and print the errors that were added or fixed since it was last analyzed."""
+        if path in self.snapshots:
+            try:
+                errors = self.analyze_file(path)
+            except SyntaxError as error:
+                # Keep the old errors until the file can be parsed again
+                self.reporter.stream.write(f"{path}: SyntaxError: {error.msg} (line {error.lineno})\n")
+                self.reporter.stream.flush()
+                return
+            except OSError:
+                # The file was removed or replaced (e.g. saved by renaming) since the poll. Try again on the next
+                # poll: the file counts as changed if it is there, or as removed if it isn't.
+                self.snapshots[path] = None
+                return
+        else:
+            errors = []
+        old_errors = Counter(self.errors_found.pop(path, []))
+        new_errors = Counter(errors)
+        if errors:
+            self.errors_found[path] = errors
+
+        lines = [f"- {self.reporter.format_error(path, error, self.reporter.message(error))}"
+                 for error in sorted((old_errors - new_errors).elements(), key=attrgetter("line_nr", "error_code"))]
+        lines += [f"+ {self.reporter.format_error(path, error, self.reporter.message(error))}"
+                  for error in sorted((new_errors - old_errors).elements(), key=attrgetter("line_nr", "error_code"))]
+        self.reporter.stream.write("".join(lines))
+        self.reporter.stream.flush()
+
+    def run(self) -> None:
+        """Poll the files and update the changed ones until interrupted with Ctrl+C."""
+        try:
+            while True:
+                start = time.perf_counter()
+                for path in self.poll():
+                    self.update(path)
+                time.sleep(max(0.0, self.interval - (time.perf_counter() - start)))
+        except KeyboardInterrupt:
+            pass
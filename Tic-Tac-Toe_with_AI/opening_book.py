@@ -0,0 +1,112 @@
+import argparse
+import os
+import time
+
+# The book is a file with one byte for every 3x3 board: the index (i * 3 + j) of the best move for the player whose
+# turn it is, or NO_MOVE if the board can't be reached in a game or the game is over. The byte of a board is at the
+# board's number in base 3, where every cell is a digit: 0 for an empty cell, 1 for X and 2 for O.
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+BOOK_SIZE = 3 ** 9
+NO_MOVE = 255
+# The base 3 number of a mask with a 1 for every set bit, for all 512 masks
+TERNARY = tuple(sum(3 ** index for index in range(9) if mask >> index & 1) for mask in range(512))
+
+
+def board_number(masks: dict) -> int:
+    """ Return the number of a board in the book, from the masks of a BitBoard. """
+    return TERNARY[masks["X"]] + 2 * TERNARY[masks["O"]]
+
+
+def generate_book() -> bytes:
+    """ Return the book: solve every board that can be reached from the empty board with GameManager.alphabeta(). """
+    # Imported here, because tictactoe imports this module
+    from tictactoe import BitBoard, GameManager
+
+    game = GameManager()
+    book = bytearray([NO_MOVE]) * BOOK_SIZE
+    boards = [(BitBoard(), "X")]
+    while boards:
+        board, symbol = boards.pop()
+        number = board_number(board.masks)
+        if book[number] != NO_MOVE or board.winner() or not board.empty():
+            continue
+        i, j = game.alphabeta(board.copy(), symbol, symbol)["coordinates"]
+        book[number] = i * 3 + j
+        for index in board.empty_cells():
+            next_board = board.copy()
+            next_board.place(index, symbol)
+            boards.append((next_board, "O" if symbol == "X" else "X"))
+    return bytes(book)
+
+
+def load_book(path: str = BOOK_FILE) -> bytes:
+    """ Return the book from a file. If the file doesn't exist (or isn't a book), generate the book and write it to
+    the file first. If the file can't be written (e.g. in a read-only directory), the book is only kept in memory. """
+    try:
+        with open(path, "rb") as file:
+            book = file.read()
+        if len(book) == BOOK_SIZE:
+            return book
+    except FileNotFoundError:
+        pass
+    book = generate_book()
+    try:
+        with open(path, "wb") as file:
+            file.write(book)
+    except OSError:
+        pass
+    return book
+
+
+def best_move(book: bytes, masks: dict) -> int:
+    """ Return the index (i * 3 + j) of the best move on the board with the masks of a BitBoard, or -1 if the board
+    isn't in the book. """
+    move = book[board_number(masks)]
+    return -1 if move == NO_MOVE else move
+
+
+def benchmark(path: str = BOOK_FILE, repeat: int = 1000) -> None:
+    """ Generate the book, write it to a file and print the time it takes to generate, load and look up moves. """
+    start = time.perf_counter()
+    book = generate_book()
+    generate_seconds = time.perf_counter() - start
+    with open(path, "wb") as file:
+        file.write(book)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        load_book(path)
+    load_seconds = (time.perf_counter() - start) / repeat
+
+    from tictactoe import BitBoard
+    all_masks = []
+    for number in range(BOOK_SIZE):
+        if book[number] != NO_MOVE:
+            board = BitBoard()
+            for index in range(9):
+                if number // 3 ** index % 3:
+                    board.place(index, "X" if number // 3 ** index % 3 == 1 else "O")
+            all_masks.append(board.masks)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for masks in all_masks:
+            best_move(book, masks)
+    lookup_seconds = (time.perf_counter() - start) / (repeat * len(all_masks))
+
+    print(f"{len(all_masks)} boards in a book of {len(book)} bytes ({path})")
+    print(f"generate: {generate_seconds * 1000:10.3f} ms")
+    print(f"load:     {load_seconds * 1000:10.3f} ms")
+    print(f"lookup:   {lookup_seconds * 10 ** 9:10.1f} ns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the opening book of the \"hard\" AI and benchmark it.")
+    parser.add_argument("-o", "--output", default=BOOK_FILE, help=f"the book file (default: {BOOK_FILE})")
+    parser.add_argument("-n", "--repeat", type=int, default=1000,
+                        help="the number of times loading and looking up are repeated (default: 1000)")
+    args = parser.parse_args()
+    benchmark(args.output, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,193 @@
+import math
 import random
+import time
+from collections import defaultdict
+from functools import lru_cache
+from operator import itemgetter
+
+import opening_book
+
+
+class BitBoard:
+    """ The board as two bit masks, one for each symbol, where bit i * cols + j is set if the symbol is in grid[i][j].
+    A player wins with k of his symbols in a row, column or diagonal (an m,n,k-game, tic-tac-toe is 3,3,3).
+
+    Every line of k cells (a window) keeps the number of symbols of each player in it, updated incrementally when
+    a symbol is placed or removed. Detecting a winner is a look at two counters, and the windows that only contain
+    the symbols of one player give a threat score for the search on big boards. """
+
+    # A window with c symbols of one player only is worth THREAT_BASE ** c to this player
+    THREAT_BASE = 10
+    # The 8 symmetries of the 3x3 board (rotations and reflections), as the cell index (i * 3 + j) that ends up at
+    # each index of the transformed board.
+    SYMMETRIES = ((0, 1, 2, 3, 4, 5, 6, 7, 8), (6, 3, 0, 7, 4, 1, 8, 5, 2), (8, 7, 6, 5, 4, 3, 2, 1, 0),
+                  (2, 5, 8, 1, 4, 7, 0, 3, 6), (2, 1, 0, 5, 4, 3, 8, 7, 6), (6, 7, 8, 3, 4, 5, 0, 1, 2),
+                  (0, 3, 6, 1, 4, 7, 2, 5, 8), (8, 5, 2, 7, 4, 1, 6, 3, 0))
+    # For every symmetry, the transformed mask of all 512 masks of the 3x3 board
+    SYMMETRY_TABLES = tuple(tuple(sum(1 << index for index, cell in enumerate(symmetry) if mask >> cell & 1)
+                                  for mask in range(512))
+                            for symmetry in SYMMETRIES)
+
+    def __init__(self, rows: int = 3, cols: int = 3, k: int = 3):
+        self.rows, self.cols, self.k = rows, cols, k
+        self.size = rows * cols
+        self.full = (1 << self.size) - 1
+        self.win_masks, self.cell_windows, self.cell_win_masks, self.move_order = self.lines(rows, cols, k)
+        # The cells of the first and the last column, to stop shifted masks from wrapping around to the next row
+        self.first_col = sum(1 << i * cols for i in range(rows))
+        self.last_col = self.first_col << cols - 1
+        self.weights = tuple(self.THREAT_BASE ** count if count else 0 for count in range(k + 1))
+        # More than the threat score of any board
+        self.win_score = self.weights[k] * (len(self.win_masks) + 1)
+        self.masks = {"X": 0, "O": 0}
+        # The number of symbols of each player in every window, in the order of win_masks
+        self.counts = {"X": [0] * len(self.win_masks), "O": [0] * len(self.win_masks)}
+        # The number of full windows of each player
+        self.wins = {"X": 0, "O": 0}
+        # The sum of the weights of X's windows minus the sum of the weights of O's windows
+        self.threats = 0
+
+    def __repr__(self):
+        return f"BitBoard(rows={self.rows}, cols={self.cols}, k={self.k}, X={self.masks['X']:b}, O={self.masks['O']:b})"
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def lines(rows: int, cols: int, k: int) -> tuple:
+        """ Return the masks of all windows (the rows, the columns, the diagonals and the anti-diagonals), the windows
+        through every cell (as indices and as masks) and the order in which the cells are searched: the cells in the
+        most windows first, the centre before the border among those. On the 3x3 board the windows are in the order
+        BoardManager.check_for_winning_move() checks them, and the order of the cells is the centre, the corners and
+        the edges. """
+        win_masks = []
+        for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            for i in range(rows):
+                for j in range(cols):
+                    if 0 <= i + di * (k - 1) < rows and 0 <= j + dj * (k - 1) < cols:
+                        win_masks.append(sum(1 << (i + di * step) * cols + j + dj * step for step in range(k)))
+        cell_windows = tuple(tuple(window for window, win_mask in enumerate(win_masks) if win_mask >> cell & 1)
+                             for cell in range(rows * cols))
+        def distance_from_centre(cell: int) -> int:
+            return (2 * (cell // cols) - rows + 1) ** 2 + (2 * (cell % cols) - cols + 1) ** 2
+
+        move_order = sorted(range(rows * cols), key=lambda cell: (-len(cell_windows[cell]), distance_from_centre(cell)))
+        cell_win_masks = tuple(tuple(win_masks[window] for window in windows) for windows in cell_windows)
+        return tuple(win_masks), cell_windows, cell_win_masks, tuple(move_order)
+
+    def copy(self) -> "BitBoard":
+        """ Return a copy of the board. """
+        board = BitBoard(self.rows, self.cols, self.k)
+        board.masks = dict(self.masks)
+        board.counts = {symbol: list(counts) for symbol, counts in self.counts.items()}
+        board.wins = dict(self.wins)
+        board.threats = self.threats
+        return board
+
+    def place(self, index: int, symbol: str) -> None:
+        """ Put the symbol in the cell with the index i * cols + j and update the windows through the cell. """
+        self.masks[symbol] |= 1 << index
+        own_counts = self.counts[symbol]
+        enemy_counts = self.counts["O" if symbol == "X" else "X"]
+        sign = 1 if symbol == "X" else -1
+        weights = self.weights
+        for window in self.cell_windows[index]:
+            count = own_counts[window]
+            own_counts[window] = count + 1
+            enemy_count = enemy_counts[window]
+            if not enemy_count:
+                self.threats += sign * (weights[count + 1] - weights[count])
+                if count + 1 == self.k:
+                    self.wins[symbol] += 1
+            elif not count:
+                # The window was a threat of the enemy, it is blocked now
+                self.threats += sign * weights[enemy_count]
+
+    def remove(self, index: int, symbol: str) -> None:
+        """ Remove the symbol from the cell with the index i * cols + j and update the windows through the cell. """
+        self.masks[symbol] &= ~(1 << index)
+        own_counts = self.counts[symbol]
+        enemy_counts = self.counts["O" if symbol == "X" else "X"]
+        sign = 1 if symbol == "X" else -1
+        weights = self.weights
+        for window in self.cell_windows[index]:
+            count = own_counts[window]
+            own_counts[window] = count - 1
+            enemy_count = enemy_counts[window]
+            if not enemy_count:
+                self.threats -= sign * (weights[count] - weights[count - 1])
+                if count == self.k:
+                    self.wins[symbol] -= 1
+            elif count == 1:
+                # The window is a threat of the enemy again
+                self.threats -= sign * weights[enemy_count]
+
+    def empty(self) -> int:
+        """ Return the mask of the empty cells. """
+        return self.full & ~(self.masks["X"] | self.masks["O"])
+
+    def empty_cells(self) -> list:
+        """ Return the indices (i * cols + j) of the empty cells, in ascending order. """
+        empty = self.empty()
+        return [index for index in range(self.size) if empty >> index & 1]
+
+    def ordered_moves(self) -> list:
+        """ Return the indices of the empty cells in the order of move_order. """
+        empty = self.empty()
+        return [index for index in self.move_order if empty >> index & 1]
+
+    def nearby_moves(self, distance: int = 1) -> list:
+        """ Return the indices of the empty cells at most distance cells (in any direction) away from a symbol, in the
+        order of move_order. On an empty board, return the first cell of move_order. """
+        return self.nearby(self.masks["X"], self.masks["O"], distance)
+
+    def nearby(self, x: int, o: int, distance: int = 1) -> list:
+        """ Return nearby_moves() for a board of this size with the masks x and o. """
+        near = x | o
+        if not near:
+            return [self.move_order[0]]
+        for _ in range(distance):
+            near |= (near << 1 & ~self.first_col | near >> 1 & ~self.last_col) & self.full
+            near |= near << self.cols & self.full | near >> self.cols
+        near &= self.full & ~(x | o)
+        return [index for index in self.move_order if near >> index & 1]
+
+    def winner(self) -> str:
+        """ Return the symbol with k in a line, or an empty string if there is none. """
+        if self.wins["X"]:
+            return "X"
+        elif self.wins["O"]:
+            return "O"
+        return ""
+
+    def winning_move(self, symbol: str) -> int:
+        """ Return the index of an empty cell that completes a line of the symbol, or -1 if there is none. """
+        own_counts = self.counts[symbol]
+        enemy_counts = self.counts["O" if symbol == "X" else "X"]
+        for window, win_mask in enumerate(self.win_masks):
+            if own_counts[window] == self.k - 1 and not enemy_counts[window]:
+                return (self.empty() & win_mask).bit_length() - 1
+        return -1
+
+    def evaluate(self, symbol: str) -> int:
+        """ Return the threat score of the board for the symbol's player. """
+        return self.threats if symbol == "X" else -self.threats
+
+    def key(self) -> int:
+        """ Return a key for the board. On the 3x3 board, it is the same for all rotations and reflections. """
+        x, o = self.masks["X"], self.masks["O"]
+        if self.rows == self.cols == 3:
+            return min(table[x] << 9 | table[o] for table in self.SYMMETRY_TABLES)
+        return x << self.size | o
 
 
 class BoardManager:
-    def __init__(self):
-        self.grid = [[" " for _ in range(3)] for _ in range(3)]
+    def __init__(self, rows: int = 3, cols: int = 3, k: int = 3, verbose: bool = True):
+        """ A board with the given number of rows and columns, where k symbols in a line win.
+        If verbose is False, the board and the moves of the computer aren't printed. """
+        self.rows, self.cols, self.k = rows, cols, k
+        self.verbose = verbose
+        self.grid = [[" " for _ in range(cols)] for _ in range(rows)]
+        # The same board as bit masks, kept in sync with the grid
+        self.bits = BitBoard(rows, cols, k)
         self.symbol_counter = {"X": 0, "O": 0}
         self.game_over = False
 
@@ -12,12 +196,7 @@ class BoardManager:
 
     def get_empty_cells(self) -> list:
         """ Return a list of all empty cells. """
-        empty_cells = []
-        for i in range(len(self.grid)):
-            for j in range(len(self.grid)):
-                if self.grid[i][j] == " ":
-                    empty_cells.append([i, j])
-        return empty_cells
+        return [[index // self.cols, index % self.cols] for index in self.bits.empty_cells()]
 
     def check_user_input(self, coords: list, symbol: str) -> None:
         """ Check if the user input is valid. If it is, confirm the input, otherwise print a message. """
@@ -29,8 +208,11 @@ class BoardManager:
             coords = [int(coords[0]), int(coords[1])]
 
         # check if input coordinates are correct
-        if coords[0] > 3 or coords[1] > 3 or coords[0] < 1 or coords[1] < 1:
-            print("Coordinates should be from 1 to 3!")
+        if coords[0] > self.rows or coords[1] > self.cols or coords[0] < 1 or coords[1] < 1:
+            if self.rows == self.cols:
+                print(f"Coordinates should be from 1 to {self.rows}!")
+            else:
+                print(f"Coordinates should be from 1 to {self.rows} and from 1 to {self.cols}!")
             return
         elif self.grid[coords[0] - 1][coords[1] - 1] != " ":
             print("This cell is occupied! Choose another one!")
@@ -41,72 +223,47 @@ class BoardManager:
     def check_computer_input(self, coords: list, symbol: str, difficulty: str) -> None:
         """ Check if the computer input is valid. If it is, confirm the input. """
         if not(self.grid[coords[0] - 1][coords[1] - 1] != " "):
-            print(f"Making move level \"{difficulty}\"")
+            if self.verbose:
+                print(f"Making move level \"{difficulty}\"")
             self.confirm_input(symbol, coords)
     
     def check_for_winning_move(self, symbol) -> list:
         """ Return the coordinate of a cell if the symbol's player is one move away from winning.
-         Return [-1, -1] if there is no winning move. """
-        # check rows
-        for row in range(len(self.grid)):
-            line = []
-            for j in range(len(self.grid)):
-                line.append(self.grid[row][j])
-            if line.count(symbol) == 2 and line.count(" ") == 1:
-                j = line.index(" ")
-                return [row + 1, j + 1]
-        # check columns
-        for column in range(len(self.grid[0])):
-            line = []
-            for i in range(len(self.grid)):
-                line.append(self.grid[i][column])
-            if line.count(symbol) == 2 and line.count(" ") == 1:
-                i = line.index(" ")
-                return [i + 1, column + 1]
-        # check diagonals
-        diagonal = []
-        empty_coords = []
-        for i in range(len(self.grid[0])):
-            j = i
-            diagonal.append(self.grid[i][j])
-            if self.grid[i][j] == " ":
-                empty_coords = [i + 1, j + 1]
-        if diagonal.count(symbol) == 2 and diagonal.count(" ") == 1:
-            return empty_coords
-        diagonal2 = []
-        for i in range(len(self.grid[0])):
-            j = 2 - i
-            diagonal2.append(self.grid[i][j])
-            if self.grid[i][j] == " ":
-                empty_coords = [i + 1, j + 1]
-        if diagonal2.count(symbol) == 2 and diagonal2.count(" ") == 1:
-            return empty_coords
-        return [-1, -1]
+         Return [-1, -1] if there is no winning move. Rows are checked first, then columns, then diagonals. """
+        index = self.bits.winning_move(symbol)
+        if index == -1:
+            return [-1, -1]
+        return [index // self.cols + 1, index % self.cols + 1]
 
     def grid_from_string(self, state: str) -> None:
-        """ Translates the string to the grid. The string must contain exactly 9 characters. """
-        if len(state) == 9:
+        """ Translates the string to the grid. The string must contain exactly one character for every cell. """
+        if len(state) == self.rows * self.cols:
             for i in range(len(state)):
-                self.grid[i // 3][i % 3] = state[i]
+                self.grid[i // self.cols][i % self.cols] = state[i]
                 if state[i] == "X" or state[i] == "O":
+                    self.bits.place(i, state[i])
                     self.symbol_counter[state[i]] += 1
 
     def make_random_move(self) -> list:
         """ Return the coordinates of a random empty cell on the board. """
         empty_cells = self.get_empty_cells()
         cell = random.choice(empty_cells)
-        print(cell)
+        if self.verbose:
+            print(cell)
         return [cell[0] + 1, cell[1] + 1]
         
     def confirm_input(self, symbol: str, coords: list) -> None:
         """ Fill the cell on given coordinate with the symbol. """
         self.grid[coords[0] - 1][coords[1] - 1] = symbol
+        self.bits.place((coords[0] - 1) * self.cols + coords[1] - 1, symbol)
         self.print_grid()
         self.symbol_counter[symbol] += 1
 
     def print_grid(self) -> None:
         """ Print the board in it's current state in a specific format. """
-        line = "---------"
+        if not self.verbose:
+            return
+        line = "-" * (2 * self.cols + 3)
         print(line)
         for row in self.grid:
             print("| ", end="")
@@ -118,37 +275,77 @@ class BoardManager:
     def analyze_game_state(self) -> str:
         """ Return the winner's symbol if there is a winner on the board.
         Return "Draw" in case of a draw and empty string otherwise"""
-        winner = ""
-        # check rows
-        for row in range(len(self.grid)):
-            if self.grid[row][0] == self.grid[row][1] == self.grid[row][2] and self.grid[row][0] != " ":
-                winner = self.grid[row][0]
-        # check columns
-        for column in range(len(self.grid[0])):
-            if self.grid[0][column] == self.grid[1][column] == self.grid[2][column] and self.grid[0][column] != " ":
-                winner = self.grid[0][column]
-        # check diagonals
-        if self.grid[0][0] == self.grid[1][1] == self.grid[2][2] and self.grid[1][1] != " ":
-            winner = self.grid[0][0]
-        if self.grid[2][0] == self.grid[1][1] == self.grid[0][2] and self.grid[1][1] != " ":
-            winner = self.grid[2][0]
-
-        if winner == "X" or winner == "O":
-            return winner
-        elif winner == "" and self.get_empty_cells() == []:
+        winner = self.bits.winner()
+        if winner == "" and not self.bits.empty():
             return "Draw"
-        else:
-            return ""
+        return winner
+
+
+class SearchTimeout(Exception):
+    """ Raised when the time of a search is up. """
+
+
+class MCTSNode:
+    """ A node of the tree of GameManager.mcts_search(): a board, the move that led to it and the results of the
+    random games played from it. The wins are counted for the player who made the move. """
+
+    __slots__ = ("move", "parent", "children", "untried_moves", "x", "o", "symbol", "result", "visits", "wins")
+
+    def __init__(self, move: int, parent, x: int, o: int, symbol: str, result: str, untried_moves: list):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        # The moves that don't have a child node yet, in random order
+        self.untried_moves = untried_moves
+        # The masks of the board and the symbol of the player whose turn it is
+        self.x, self.o = x, o
+        self.symbol = symbol
+        # The winner's symbol or "Draw" if the game is over, else an empty string
+        self.result = result
+        self.visits = 0
+        self.wins = 0.0
+
+    def __repr__(self):
+        return f"MCTSNode(move={self.move}, visits={self.visits}, wins={self.wins}, children={len(self.children)})"
 
 
 class GameManager:
-    def __init__(self):
+    # The kinds of scores in the alpha-beta transposition table: the exact score, or a bound of it
+    EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+    # Boards with up to this many cells are searched to the end, bigger ones with iterative_deepening()
+    EXACT_SEARCH_CELLS = 9
+    # The number of moves searched on every turn of iterative_deepening(), see candidate_moves()
+    BRANCHING = 12
+    # How much mcts_search() prefers moves that were tried less often to moves that won more often
+    MCTS_EXPLORATION = 1.4
+
+    def __init__(self, verbose: bool = True):
+        """ If verbose is False, the games are played without printing anything (see play_game()). """
+        self.verbose = verbose
         self.initial_state = "         "
-        self.difficulties = ["easy", "medium", "hard"]
+        self.difficulties = ["easy", "medium", "hard", "mcts"]
         self.player1 = ""
         self.player2 = ""
-        self.board = BoardManager()
+        # The dimensions of the board (rows, columns, symbols in a line to win)
+        self.rows, self.cols, self.k = 3, 3, 3
+        # The number of seconds the "hard" AI searches on boards that are too big to search to the end, and the
+        # most seconds the "mcts" AI searches
+        self.time_budget = 1.0
+        # The number of random games the "mcts" AI plays for every move, and its tree from the last move
+        self.mcts_iterations = 2000
+        self.mcts_root = None
+        # The best moves of all 3x3 boards, loaded on the first move of the "hard" AI (see opening_book.py)
+        self.opening_book = None
+        self.board = BoardManager(verbose=verbose)
         self.function_calls = 0
+        # The number of moves and the total seconds the computer took to decide on them, for every difficulty
+        self.decisions = defaultdict(int)
+        self.decision_seconds = defaultdict(float)
+        # The minimax scores of the boards that were already searched, see minimax(). The score of a board only
+        # depends on the board and the players, so the table is kept between moves and games.
+        self.transpositions = {}
+        # The same for alphabeta(), with the kind of every score (EXACT, LOWER_BOUND or UPPER_BOUND)
+        self.alphabeta_transpositions = {}
 
     def who_plays_next(self) -> tuple:
         """ Return the player and his symbol whose turn it is. """
@@ -178,32 +375,158 @@ class GameManager:
 
     def hard_move(self, symbol: str) -> None:
         """ Make a move with the "hard" AI.
-        Determines and makes the best possible move using the minimax algorithm. (Will never lose) """
+        Determines and makes the best possible move using minimax with alpha-beta pruning. (Will never lose)
+        On the 3x3 board, the move is looked up in the opening book, which holds the move alphabeta() finds for
+        every board. On big boards, the best move found within the time budget is made instead,
+        see iterative_deepening(). """
         self.function_calls = 0
-        new_board = BoardManager()
-        new_board.grid = self.board.grid
-        best_move = self.minimax(new_board, symbol, symbol)
+        board = self.board.bits.copy()
+        index = -1
+        if (board.rows, board.cols, board.k) == (3, 3, 3):
+            if self.opening_book is None:
+                self.opening_book = opening_book.load_book()
+            index = opening_book.best_move(self.opening_book, board.masks)
+        if index != -1:
+            best_move = {"coordinates": [index // 3, index % 3]}
+        elif board.size <= self.EXACT_SEARCH_CELLS:
+            best_move = self.alphabeta(board, symbol, symbol)
+        else:
+            best_move = self.iterative_deepening(board, symbol, self.time_budget)
         # Take the coordinates of the return move, discard the score as it doesn't interest us anymore.
         i, j = best_move["coordinates"]
         self.board.check_computer_input([i + 1, j + 1], symbol, "hard")
-        # print(self.function_calls)  # uncomment to print the number of function calls on minimax()
-
-    def minimax(self, new_board: BoardManager, symbol: str, own_symbol: str) -> dict:
+        # print(self.function_calls)  # uncomment to print the number of function calls on alphabeta()
+
+    def mcts_move(self, symbol: str) -> None:
+        """ Make a move with the "mcts" AI, see mcts_search(). Its strength grows with mcts_iterations. """
+        index = self.mcts_search(self.board.bits, symbol, self.mcts_iterations, self.time_budget)
+        self.board.check_computer_input([index // self.board.cols + 1, index % self.board.cols + 1], symbol, "mcts")
+
+    def mcts_search(self, board: BitBoard, symbol: str, iterations: int, time_budget: float) -> int:
+        """ Return the index of the best move found by Monte Carlo tree search, after the given number of iterations
+        or when the time budget (in seconds) is up. At least one iteration is always run, so there is a move.
+
+        Every iteration walks down the tree, choosing the child with the best upper confidence bound (UCT), adds a
+        child for an untried move and plays a random game from there (see mcts_rollout()). The result is counted in
+        all nodes on the way. The move with the most visits is the best move.
+        The tree of the last search is reused if the board is one or two moves further down in it. """
+        deadline = time.perf_counter() + time_budget
+        root = self.mcts_reuse_tree(board, symbol)
+        if root is None:
+            x, o = board.masks["X"], board.masks["O"]
+            root = MCTSNode(-1, None, x, o, symbol, "", self.mcts_moves(board, x, o))
+
+        for iteration in range(max(1, iterations)):
+            if iteration and time.perf_counter() > deadline:
+                break
+            # Selection
+            node = root
+            while not node.untried_moves and node.children:
+                log_visits = math.log(node.visits)
+                node = max(node.children, key=lambda child: child.wins / child.visits + self.MCTS_EXPLORATION
+                           * math.sqrt(log_visits / child.visits))
+            # Expansion
+            if node.untried_moves:
+                node = self.mcts_expand(board, node)
+            # Simulation
+            result = node.result or self.mcts_rollout(board, node.x, node.o, node.symbol)
+            # Backpropagation
+            while node is not None:
+                node.visits += 1
+                if result == "Draw":
+                    node.wins += 0.5
+                elif result != node.symbol:
+                    # The player who made the move into the node won
+                    node.wins += 1
+                node = node.parent
+
+        self.mcts_root = root
+        return max(root.children, key=lambda child: child.visits).move
+
+    def mcts_moves(self, board: BitBoard, x: int, o: int) -> list:
+        """ Return the moves of a node in random order: all empty cells on small boards, the empty cells next to a
+        symbol on big boards. """
+        if board.size <= self.EXACT_SEARCH_CELLS:
+            empty = board.full & ~(x | o)
+            moves = [index for index in range(board.size) if empty >> index & 1]
+        else:
+            moves = board.nearby(x, o)
+        random.shuffle(moves)
+        return moves
+
+    def mcts_expand(self, board: BitBoard, node: MCTSNode) -> MCTSNode:
+        """ Add a child for one of the untried moves of a node and return it. """
+        index = node.untried_moves.pop()
+        x, o = node.x, node.o
+        if node.symbol == "X":
+            x |= 1 << index
+            mask = x
+        else:
+            o |= 1 << index
+            mask = o
+        result = ""
+        if any(mask & win_mask == win_mask for win_mask in board.cell_win_masks[index]):
+            result = node.symbol
+        elif x | o == board.full:
+            result = "Draw"
+        untried_moves = [] if result else self.mcts_moves(board, x, o)
+        child = MCTSNode(index, node, x, o, "O" if node.symbol == "X" else "X", result, untried_moves)
+        node.children.append(child)
+        return child
+
+    def mcts_rollout(self, board: BitBoard, x: int, o: int, symbol: str) -> str:
+        """ Play random moves from a board until the game is over and return the winner's symbol or "Draw".
+        Only the masks are changed, and only the lines through the last move are checked for a win. """
+        empty = board.full & ~(x | o)
+        cells = [index for index in range(board.size) if empty >> index & 1]
+        random.shuffle(cells)
+        masks = {"X": x, "O": o}
+        cell_win_masks = board.cell_win_masks
+        for index in cells:
+            mask = masks[symbol] | 1 << index
+            masks[symbol] = mask
+            for win_mask in cell_win_masks[index]:
+                if mask & win_mask == win_mask:
+                    return symbol
+            symbol = "O" if symbol == "X" else "X"
+        return "Draw"
+
+    def mcts_reuse_tree(self, board: BitBoard, symbol: str):
+        """ Return the node of the last search's tree for the board, if it is the root of the tree or up to two moves
+        below it. Return None otherwise. """
+        if self.mcts_root is None:
+            return None
+        x, o = board.masks["X"], board.masks["O"]
+        nodes = [self.mcts_root]
+        for _ in range(3):
+            for node in nodes:
+                if node.x == x and node.o == o and node.symbol == symbol:
+                    node.parent = None
+                    return node
+            nodes = [child for node in nodes for child in node.children]
+        return None
+
+    def minimax(self, new_board: BitBoard, symbol: str, own_symbol: str) -> dict:
         """ Return the best possible move using the minimax algorithm. Takes a board, a player symbol and the symbol
         of the player, that want's to calculate the move.
 
         This is a copy of the tutorial (https://www.freecodecamp.org/news/how-to-make-your-tic-tac-toe-game-unbeatable-by-using-the-minimax-algorithm-9d690bad4b37/),
         translated to python and slightly modified to work with the rest of this script. Most notably, his allows the
-        game to run two AIs with this algorithm against each other. """
+        game to run two AIs with this algorithm against each other.
+
+        The board is a BitBoard, so the empty cells and the terminal states are found with bit operations.
+        The scores of the boards after each move are stored in a transposition table, keyed by the board (up to
+        symmetry, see BitBoard.key()) and the players. A board that was already searched, in this or an earlier call,
+        isn't searched again. The board passed in is always searched, because its best move is needed. """
 
         # Just to track the number of function calls.
         self.function_calls += 1
         # A list of all remaining empty cells on the board
-        available_cells = new_board.get_empty_cells()
+        available_cells = new_board.empty_cells()
         # Determines the symbol of the enemy player, so that two AIs can run the algorithm against each other.
         enemy_symbol = "X" if own_symbol == "O" else "O"
         # Checks for the terminal states win, lose and draw and returns a value accordingly.
-        state = new_board.analyze_game_state()
+        state = new_board.winner()
         if state == own_symbol:
             return {"coordinates": [], "score": 10}
         elif state == enemy_symbol:
@@ -218,22 +541,22 @@ class GameManager:
         for i in range(len(available_cells)):
             # Create a move dict, that contains the coordinates and the score of the move.
             move = {}
-            coords = available_cells[i]
+            index = available_cells[i]
             # Assign the coordinates to the move
-            move["coordinates"] = coords
+            move["coordinates"] = [index // new_board.cols, index % new_board.cols]
             # Set the empty cell to the current players symbol
-            new_board.grid[coords[0]][coords[1]] = symbol
+            new_board.place(index, symbol)
 
             # Collect the score resulting from calling minimax on the opponent of the current player.
-            if symbol == own_symbol:
-                result = self.minimax(new_board, enemy_symbol, own_symbol)
-                move["score"] = result["score"]
-            else:
-                result = self.minimax(new_board, own_symbol, own_symbol)
-                move["score"] = result["score"]
+            # Look it up in the transposition table first, and store it there if the board wasn't searched yet.
+            next_symbol = enemy_symbol if symbol == own_symbol else own_symbol
+            key = (new_board.key(), next_symbol, own_symbol)
+            if key not in self.transpositions:
+                self.transpositions[key] = self.minimax(new_board, next_symbol, own_symbol)["score"]
+            move["score"] = self.transpositions[key]
 
             # Reset the cell to be empty
-            new_board.grid[coords[0]][coords[1]] = " "
+            new_board.remove(index, symbol)
             # Put the move to the end of the list.
             moves.append(move)
 
@@ -258,20 +581,181 @@ class GameManager:
         # Remember, a move is a dict that contains the coordinates and score associated with it.
         return best_move
 
+    def alphabeta(self, board: BitBoard, symbol: str, own_symbol: str, alpha: int = -100, beta: int = 100) -> dict:
+        """ Return the best possible move like minimax(), but skip the moves that can't change the result
+        (alpha-beta pruning). alpha is the score the own player is already sure to get, beta the score the enemy
+        player is already sure to get. The moves are searched in the order of BitBoard.move_order, because moves to
+        the centre and the corners are more often the best ones, which prunes more moves.
+
+        A win scores 1 + the number of empty cells left, a loss the negative of it and a draw 0, so faster wins are
+        preferred to slower ones (and slower losses to faster ones). The scores of the boards after each move are
+        stored in a transposition table, like in minimax(). Because a pruned search only finds a bound of the score,
+        the kind of the score is stored as well. """
+        self.function_calls += 1
+        enemy_symbol = "X" if own_symbol == "O" else "O"
+        empty = board.empty()
+        state = board.winner()
+        if state == own_symbol:
+            return {"coordinates": [], "score": 1 + empty.bit_count()}
+        elif state == enemy_symbol:
+            return {"coordinates": [], "score": -1 - empty.bit_count()}
+        elif not empty:
+            return {"coordinates": [], "score": 0}
+
+        maximizing = symbol == own_symbol
+        next_symbol = enemy_symbol if maximizing else own_symbol
+        best_move = {"coordinates": [], "score": -10000 if maximizing else 10000}
+        for index in board.ordered_moves():
+            board.place(index, symbol)
+            score = self.alphabeta_score(board, next_symbol, own_symbol, alpha, beta)
+            board.remove(index, symbol)
+
+            if maximizing and score > best_move["score"]:
+                best_move = {"coordinates": [index // board.cols, index % board.cols], "score": score}
+                alpha = max(alpha, score)
+            elif not maximizing and score < best_move["score"]:
+                best_move = {"coordinates": [index // board.cols, index % board.cols], "score": score}
+                beta = min(beta, score)
+            # The other player won't allow this board, no need to search the remaining moves
+            if alpha >= beta:
+                break
+        return best_move
+
+    def alphabeta_score(self, board: BitBoard, symbol: str, own_symbol: str, alpha: int, beta: int) -> int:
+        """ Return the score of alphabeta() for a board, from the transposition table if it is known well enough. """
+        key = (board.key(), symbol, own_symbol)
+        entry = self.alphabeta_transpositions.get(key)
+        if entry is not None:
+            score, kind = entry
+            if kind == self.EXACT:
+                return score
+            elif kind == self.LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+
+        score = self.alphabeta(board, symbol, own_symbol, alpha, beta)["score"]
+        if score <= alpha:
+            kind = self.UPPER_BOUND
+        elif score >= beta:
+            kind = self.LOWER_BOUND
+        else:
+            kind = self.EXACT
+        self.alphabeta_transpositions[key] = score, kind
+        return score
+
+    def iterative_deepening(self, board: BitBoard, symbol: str, time_budget: float) -> dict:
+        """ Return the best move found by depth_limited_alphabeta() within the time budget (in seconds).
+        The search is repeated with a depth of 1, 2, 3, ... moves until the time is up, and the best move of the
+        deepest finished search is returned. Every search starts with the best move of the search before, which
+        prunes the most moves. It stops early when it finds a forced win or loss. """
+        deadline = time.perf_counter() + time_budget
+        moves = self.candidate_moves(board, symbol)
+        best_move = {"coordinates": [moves[0] // board.cols, moves[0] % board.cols], "score": 0}
+        for depth in range(1, board.empty().bit_count() + 1):
+            try:
+                best_move = self.depth_limited_alphabeta(board, symbol, symbol, depth, deadline, moves=moves)
+            except SearchTimeout:
+                break
+            i, j = best_move["coordinates"]
+            moves.remove(i * board.cols + j)
+            moves.insert(0, i * board.cols + j)
+            if abs(best_move["score"]) >= board.win_score:
+                break
+        return best_move
+
+    def depth_limited_alphabeta(self, board: BitBoard, symbol: str, own_symbol: str, depth: int, deadline: float,
+                                alpha: float = float("-inf"), beta: float = float("inf"), moves: list = None) -> dict:
+        """ Return the best move like alphabeta(), but only look depth moves ahead and score the boards there by
+        their threats (see BitBoard.evaluate()). Only the candidate_moves() are searched, or the given moves.
+        A win scores more than any threat score. Raise SearchTimeout if the time is past the deadline. """
+        self.function_calls += 1
+        if time.perf_counter() > deadline:
+            raise SearchTimeout
+        enemy_symbol = "X" if own_symbol == "O" else "O"
+        empty = board.empty()
+        state = board.winner()
+        if state == own_symbol:
+            return {"coordinates": [], "score": board.win_score + empty.bit_count()}
+        elif state == enemy_symbol:
+            return {"coordinates": [], "score": -board.win_score - empty.bit_count()}
+        elif not empty:
+            return {"coordinates": [], "score": 0}
+        elif depth == 0:
+            return {"coordinates": [], "score": board.evaluate(own_symbol)}
+
+        maximizing = symbol == own_symbol
+        next_symbol = enemy_symbol if maximizing else own_symbol
+        best_move = {"coordinates": [], "score": float("-inf") if maximizing else float("inf")}
+        for index in moves or self.candidate_moves(board, symbol):
+            board.place(index, symbol)
+            try:
+                score = self.depth_limited_alphabeta(board, next_symbol, own_symbol, depth - 1, deadline,
+                                                     alpha, beta)["score"]
+            finally:
+                board.remove(index, symbol)
+
+            if maximizing and score > best_move["score"]:
+                best_move = {"coordinates": [index // board.cols, index % board.cols], "score": score}
+                alpha = max(alpha, score)
+            elif not maximizing and score < best_move["score"]:
+                best_move = {"coordinates": [index // board.cols, index % board.cols], "score": score}
+                beta = min(beta, score)
+            if alpha >= beta:
+                break
+        return best_move
+
+    def candidate_moves(self, board: BitBoard, symbol: str) -> list:
+        """ Return the moves worth searching for the symbol's player on a big board, the most promising first.
+        If the player can win, that is the only move, else if the enemy player can win, blocking him is the only move.
+        Else these are the empty cells next to a symbol, sorted by the threat score after the move (which includes
+        the blocked threats of the enemy), at most BRANCHING of them. """
+        index = board.winning_move(symbol)
+        if index == -1:
+            index = board.winning_move("X" if symbol == "O" else "O")
+        if index != -1:
+            return [index]
+
+        scored_moves = []
+        for index in board.nearby_moves():
+            board.place(index, symbol)
+            scored_moves.append((board.evaluate(symbol), index))
+            board.remove(index, symbol)
+        scored_moves.sort(key=itemgetter(0), reverse=True)
+        return [index for _, index in scored_moves[:self.BRANCHING]]
+
+    def parse_dimensions(self, params: list):
+        """ Return the dimensions (rows, columns, k) from the parameters of the start command, (3, 3, 3) if there are
+        none. Return None if they are invalid: k must be between 1 and the number of rows or columns. """
+        if not params:
+            return 3, 3, 3
+        if len(params) != 3 or not all(param.isdigit() for param in params):
+            return None
+        rows, cols, k = [int(param) for param in params]
+        if rows < 1 or cols < 1 or not 1 <= k <= max(rows, cols):
+            return None
+        return rows, cols, k
+
     def menu_loop(self) -> None:
         """ Menu loop, loop until valid parameters are entered by the user.
         Start the game with specified players/AIs or exit the script. """
-        print("Accepted command: start/exit user/difficulty user/difficulty (difficulty = easy/medium/hard)")
+        print("Accepted command: start/exit user/difficulty user/difficulty [rows columns k] "
+              "(difficulty = easy/medium/hard/mcts, k = symbols in a line to win, default: 3 3 3)")
         valid_params = False
         while not valid_params:
             params = input("Input command: ").split()
             if params[0] == "exit":
                 exit()
-            if len(params) == 3 and params[0] == "start" \
+            dimensions = self.parse_dimensions(params[3:])
+            if len(params) >= 3 and params[0] == "start" \
                     and (params[1] == "user" or params[1] in self.difficulties) \
-                    and (params[2] == "user" or params[2] in self.difficulties):
+                    and (params[2] == "user" or params[2] in self.difficulties) \
+                    and dimensions is not None:
                 self.player1 = params[1]
                 self.player2 = params[2]
+                self.rows, self.cols, self.k = dimensions
                 valid_params = True
             else:
                 print("Bad parameters!")
@@ -279,44 +763,66 @@ class GameManager:
         self.start_game()
 
     def start_game(self) -> None:
-        """ Create a new board. If the board is supposed to have an initial not empty state,
-        change the self.initial_state string in the __init__ method.
-        Start the main game loop. """
-        self.board.__init__()
-        self.board.grid_from_string(self.initial_state)
+        """ Create a new board and start the main game loop. """
+        self.new_board()
         self.board.print_grid()
         self.game_loop()
 
+    def new_board(self) -> None:
+        """ Create a new board with the dimensions of the game. If the board is supposed to have an initial not empty
+        state, change the self.initial_state string in the __init__ method (it is only used on boards of the same
+        size). """
+        if (self.rows, self.cols, self.k) != (self.board.rows, self.board.cols, self.board.k):
+            # The scores in the transposition tables are only valid for one kind of board
+            self.transpositions.clear()
+            self.alphabeta_transpositions.clear()
+        self.board = BoardManager(self.rows, self.cols, self.k, self.verbose)
+        self.board.grid_from_string(self.initial_state)
+        self.mcts_root = None
+
     def end_game(self, end_state) -> None:
         """ Print the result of game and declare the game as over. """
-        if end_state == "Draw":
-            print("Draw")
-        else:
-            print(f"{end_state} wins")
+        if self.verbose:
+            if end_state == "Draw":
+                print("Draw")
+            else:
+                print(f"{end_state} wins")
         self.board.game_over = True
 
     def game_loop(self) -> None:
         """ Main game loop, run until the game is over.
         Go back to the menu after. """
+        self.play_game()
+
+        # Go back to menu after game is over
+        self.menu_loop()
+
+    def play_game(self) -> str:
+        """ Play on the board until the game is over and return the result: the winner's symbol or "Draw".
+        The time the computer takes for every move is added to decision_seconds. """
         while not self.board.game_over:
             current_player, symbol = self.who_plays_next()
             if current_player == "user":
                 coordinates = input("Enter the coordinates: ").split()
                 self.board.check_user_input(coordinates, symbol)
-            elif current_player == "easy":
-                self.easy_move(symbol)
-            elif current_player == "medium":
-                self.medium_move(symbol)
-            elif current_player == "hard":
-                self.hard_move(symbol)
+            else:
+                start = time.perf_counter()
+                if current_player == "easy":
+                    self.easy_move(symbol)
+                elif current_player == "medium":
+                    self.medium_move(symbol)
+                elif current_player == "hard":
+                    self.hard_move(symbol)
+                elif current_player == "mcts":
+                    self.mcts_move(symbol)
+                self.decision_seconds[current_player] += time.perf_counter() - start
+                self.decisions[current_player] += 1
 
             # Check if game is over
             state = self.board.analyze_game_state()
             if state == symbol or state == "Draw":
                 self.end_game(state)
-
-        # Go back to menu after game is over
-        self.menu_loop()
+        return self.board.analyze_game_state()
 
 
 def main():
@@ -0,0 +1,126 @@
+import argparse
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import opening_book
+from tictactoe import GameManager
+
+DIFFICULTIES = ("easy", "medium", "hard", "mcts")
+
+
+def play_games(player1: str, player2: str, games: int, dimensions: tuple = (3, 3, 3), seed: int = None,
+               time_budget: float = 1.0, mcts_iterations: int = 2000) -> tuple:
+    """ Play games between two computer players without printing anything and return a Counter of the results
+    ("X", "O" or "Draw"), the number of moves and the seconds spent deciding on them for every difficulty.
+
+    :param player1: The difficulty of the player with X, who starts.
+    :param player2: The difficulty of the player with O.
+    :param games: The number of games.
+    :param dimensions: (optional) The rows, columns and k of the board. Defaults to (3, 3, 3).
+    :param seed: (optional) The seed for the random moves. Defaults to None (a random seed).
+    :param time_budget: (optional) The seconds the "hard" AI searches for a move on big boards, and the most seconds
+        the "mcts" AI searches. Defaults to 1.0.
+    :param mcts_iterations: (optional) The random games the "mcts" AI plays for every move. Defaults to 2000.
+    """
+    random.seed(seed)
+    game = GameManager(verbose=False)
+    game.player1, game.player2 = player1, player2
+    game.rows, game.cols, game.k = dimensions
+    game.time_budget = time_budget
+    game.mcts_iterations = mcts_iterations
+    results = Counter()
+    for _ in range(games):
+        game.new_board()
+        results[game.play_game()] += 1
+    return results, dict(game.decisions), dict(game.decision_seconds)
+
+
+def run_tournament(player1: str, player2: str, games: int, jobs: int = None, dimensions: tuple = (3, 3, 3),
+                   seed: int = None, time_budget: float = 1.0, mcts_iterations: int = 2000) -> dict:
+    """ Play games between two computer players, spread over a pool of processes, see play_games().
+    Return the results, the moves and the decision seconds for every difficulty and the seconds it took. """
+    jobs = jobs or os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    if "hard" in (player1, player2) and dimensions == (3, 3, 3):
+        # Generate the opening book once, before the processes load it
+        opening_book.load_book()
+
+    # A few batches per process, so a process with slow games doesn't hold up the others
+    batches = min(games, jobs * 4)
+    batch_sizes = [games // batches + (batch < games % batches) for batch in range(batches)]
+
+    start = time.perf_counter()
+    results = Counter()
+    decisions = defaultdict(int)
+    decision_seconds = defaultdict(float)
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = [executor.submit(play_games, player1, player2, batch_size, dimensions, seed + batch, time_budget,
+                                   mcts_iterations)
+                   for batch, batch_size in enumerate(batch_sizes)]
+        for future in futures:
+            batch_results, batch_decisions, batch_seconds = future.result()
+            results.update(batch_results)
+            for difficulty, moves in batch_decisions.items():
+                decisions[difficulty] += moves
+                decision_seconds[difficulty] += batch_seconds[difficulty]
+    return {"results": results, "decisions": decisions, "decision_seconds": decision_seconds,
+            "seconds": time.perf_counter() - start}
+
+
+def report(player1: str, player2: str, games: int, tournament: dict) -> str:
+    """ Return a summary of a tournament: the win and draw rates, the games per second and the average time the
+    computer took for a move on every difficulty. """
+    results = tournament["results"]
+    rates = {f"X ({player1}) wins:": results["X"] / games,
+             f"O ({player2}) wins:": results["O"] / games,
+             "draws:": results["Draw"] / games}
+    width = max(len(label) for label in rates)
+    lines = [f"{games} games, X: {player1}, O: {player2}"]
+    lines += [f"{label:<{width}}{rate:9.2%}" for label, rate in rates.items()]
+    lines += [f"{games / tournament['seconds']:.1f} games per second ({tournament['seconds']:.3f} seconds)",
+              "",
+              f"{'level':<10}{'moves':>10}{'ms/move':>12}"]
+    for difficulty in DIFFICULTIES:
+        moves = tournament["decisions"].get(difficulty)
+        if moves:
+            milliseconds = tournament["decision_seconds"][difficulty] / moves * 1000
+            lines.append(f"{difficulty:<10}{moves:>10}{milliseconds:>12.4f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play games between two computer players without printing the "
+                                                 "boards and report the results.")
+    parser.add_argument("player1", choices=DIFFICULTIES, help="the difficulty of the player with X, who starts")
+    parser.add_argument("player2", choices=DIFFICULTIES, help="the difficulty of the player with O")
+    parser.add_argument("-n", "--games", type=int, default=1000, help="the number of games (default: 1000)")
+    parser.add_argument("-j", "--jobs", type=int, help="the number of processes (default: number of CPUs)")
+    parser.add_argument("--size", nargs=3, type=int, default=[3, 3, 3], metavar=("ROWS", "COLUMNS", "K"),
+                        help="the dimensions of the board and the symbols in a line to win (default: 3 3 3)")
+    parser.add_argument("--seed", type=int, help="the seed for the random moves (default: random)")
+    parser.add_argument("--time_budget", type=float, default=1.0,
+                        help="the seconds the hard AI searches for a move on big boards, and the most seconds the "
+                             "mcts AI searches (default: 1.0)")
+    parser.add_argument("--mcts_iterations", type=int, default=2000,
+                        help="the random games the mcts AI plays for every move (default: 2000)")
+    args = parser.parse_args()
+    if args.games < 1:
+        parser.error("the number of games must be at least 1")
+    if args.mcts_iterations < 1:
+        parser.error("the number of MCTS iterations must be at least 1")
+    # The same rule as the start command of the menu
+    if GameManager(verbose=False).parse_dimensions([str(number) for number in args.size]) is None:
+        parser.error("invalid size: the rows and columns must be at least 1 and k between 1 and the number of rows "
+                     "or columns")
+
+    tournament = run_tournament(args.player1, args.player2, args.games, args.jobs, tuple(args.size), args.seed,
+                                args.time_budget, args.mcts_iterations)
+    print(report(args.player1, args.player2, args.games, tournament))
+
+
+if __name__ == "__main__":
+    main()